@@ -0,0 +1,205 @@
+import sys
+import json
+import time
+import platform
+import tracemalloc
+import numpy as np
+
+import mandelbrot
+import investigate_error
+from monte_carlo import monte_carlo_integration, area_by_iteration, area_by_sampling
+from sampling_method import pure_random, halton_sequence, latin_square_chaos, orthogonal_native
+
+RE = (mandelbrot.RE_MIN, mandelbrot.RE_MAX)
+IM = (mandelbrot.IM_MIN, mandelbrot.IM_MAX)
+GRID = ((1000, 100, 300, 200), (10000, 500, 600, 400))  # (samples s, iterations i, width w, height h)
+WARMUP = 1  # Number of untimed runs before timing a stage
+REPEATS = 3  # Number of timed runs of a stage
+THRESHOLD = 0.1  # Relative slowdown (or memory increase) above which a stage is reported as a regression
+
+
+def _samples(s, w, h, rng):
+    """
+    s random points of the complex plane.
+    """
+    x, y = pure_random(w, h, s, rng)
+    return mandelbrot.grid_map_batch(x, y, RE, IM, w, h)
+
+
+def _details(s, i, w, h, rng):
+    """
+    Number of iterations of s random points, as returned by monte_carlo_integration.
+    """
+    return mandelbrot.mandelbrot_batch(_samples(s, w, h, rng), i).astype(np.float64)
+
+
+def _setup_mandelbrot(s, i, w, h, rng):
+    c = _samples(s, w, h, rng).tolist()
+    return lambda: [mandelbrot.mandelbrot(v, i) for v in c]
+
+
+def _setup_mandelbrot_batch(s, i, w, h, rng):
+    c = _samples(s, w, h, rng)
+    return lambda: mandelbrot.mandelbrot_batch(c, i)
+
+
+def _setup_mandelbrot_set(s, i, w, h, rng):
+    return lambda: mandelbrot.mandelbrot_set(RE, IM, i, w, h)
+
+
+def _setup_monte_carlo_integration(s, i, w, h, rng):
+    return lambda: monte_carlo_integration(RE, IM, w, h, s, i, rng=rng)
+
+
+def _setup_sampler(method):
+    return lambda s, i, w, h, rng: lambda: method(w, h, s, rng)
+
+
+def _setup_area_by_iteration(s, i, w, h, rng):
+    details = _details(s, i, w, h, rng)
+    return lambda: area_by_iteration(details, i, 1.)
+
+
+def _setup_area_by_sampling(s, i, w, h, rng):
+    details = _details(s, i, w, h, rng)
+    return lambda: area_by_sampling(details, i, 1.)
+
+
+def _setup_area_stack_per_method(s, i, w, h, rng):
+    return lambda: investigate_error.area_stack_per_method(RE, IM, w, h, s, i, 1, rng=rng)
+
+
+def _samples_iterations(s, i, w, h):
+    return s * i
+
+
+def _samples_only(s, i, w, h):
+    return s
+
+
+# Stages: name -> (setup, work). setup(s, i, w, h, rng) prepares the inputs (untimed) and returns the timed function,
+# work(s, i, w, h) is the number of samples x iterations (samples for the samplers) processed by one run.
+STAGES = {
+    'mandelbrot': (_setup_mandelbrot, _samples_iterations),
+    'mandelbrot_batch': (_setup_mandelbrot_batch, _samples_iterations),
+    'mandelbrot_set': (_setup_mandelbrot_set, lambda s, i, w, h: w * h * i),
+    'monte_carlo_integration': (_setup_monte_carlo_integration, _samples_iterations),
+    'pure_random': (_setup_sampler(pure_random), _samples_only),
+    'halton_sequence': (_setup_sampler(halton_sequence), _samples_only),
+    'latin_square_chaos': (_setup_sampler(latin_square_chaos), _samples_only),
+    'orthogonal_native': (_setup_sampler(orthogonal_native), _samples_only),
+    'area_by_iteration': (_setup_area_by_iteration, _samples_iterations),
+    'area_by_sampling': (_setup_area_by_sampling, _samples_iterations),
+    'area_stack_per_method': (_setup_area_stack_per_method,
+                              lambda s, i, w, h: len(investigate_error.METHODS) * s * i),
+}
+
+
+def benchmark_stage(stage, s, i, w, h, warmup=WARMUP, repeats=REPEATS, seed=0):
+    """
+    Time a stage: warmup untimed runs, then repeats timed runs, and one more run to measure the peak memory.
+    :param stage: name of the stage (key of STAGES)
+    :param s: Number of samples
+    :param i: Number of iteration
+    :param w: width of the grid
+    :param h: height of the grid
+    :param warmup: number of untimed runs
+    :param repeats: number of timed runs
+    :param seed: seed of the RNG of the stage
+    :return: dict of the parameters, times (s), throughput (work / s) and peak memory (bytes)
+    """
+    setup, work = STAGES[stage]
+    run = setup(s, i, w, h, np.random.default_rng(seed))
+
+    for _ in range(warmup):
+        run()
+
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+
+    # Memory is traced in a separate run, tracing slows down allocations.
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(times)
+    return {'stage': stage, 's': s, 'i': i, 'w': w, 'h': h, 'best': best, 'median': float(np.median(times)),
+            'times': times, 'throughput': work(s, i, w, h) / best, 'peak_memory': peak}
+
+
+def run_benchmarks(stages=None, grid=GRID, warmup=WARMUP, repeats=REPEATS):
+    """
+    Benchmark stages over a grid of parameters.
+    :param stages: names of the stages (all the STAGES if None)
+    :param grid: tuples (s, i, w, h)
+    :param warmup: number of untimed runs
+    :param repeats: number of timed runs
+    :return: dict of the environment and list of the results of benchmark_stage
+    """
+    stages = list(STAGES) if stages is None else stages
+    results = []
+    for s, i, w, h in grid:
+        for stage in stages:
+            result = benchmark_stage(stage, s, i, w, h, warmup, repeats)
+            print("{stage:>24} s={s:<7} i={i:<6} {w}x{h}  best {best:.4f} s  {throughput:.3e} /s  "
+                  "peak {peak_memory} B".format(**result))
+            results.append(result)
+
+    environment = {'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(),
+                   'processor': platform.processor()}
+    return {'environment': environment, 'results': results}
+
+
+def save(run, path):
+    """
+    Save a benchmark run as JSON.
+    """
+    with open(path, 'w') as f:
+        json.dump(run, f, indent=2)
+
+
+def load(path):
+    """
+    Load a benchmark run saved with save.
+    """
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline, current, threshold=THRESHOLD):
+    """
+    Compare two benchmark runs: stages (with the same parameters) whose best time or peak memory
+    increased by more than threshold are regressions.
+    :param baseline: benchmark run of reference
+    :param current: new benchmark run
+    :param threshold: relative increase tolerated
+    :return: list of (stage, s, i, w, h, measure, ratio current / baseline) of the regressions
+    """
+    key = lambda r: (r['stage'], r['s'], r['i'], r['w'], r['h'])
+    reference = {key(r): r for r in baseline['results']}
+
+    regressions = []
+    for r in current['results']:
+        if key(r) not in reference:
+            continue
+        for measure in ('best', 'peak_memory'):
+            old = reference[key(r)][measure]
+            if old > 0 and r[measure] / old > 1 + threshold:
+                regressions.append(key(r) + (measure, r[measure] / old))
+    return regressions
+
+
+if __name__ == '__main__':
+    # python benchmark.py output.json [baseline.json]
+    run = run_benchmarks()
+    save(run, sys.argv[1] if len(sys.argv) > 1 else 'benchmark.json')
+
+    if len(sys.argv) > 2:
+        regressions = compare(load(sys.argv[2]), run)
+        for stage, s, i, w, h, measure, ratio in regressions:
+            print("Regression: {0} s={1} i={2} {3}x{4} {5} x{6:.2f}".format(stage, s, i, w, h, measure, ratio))
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,82 @@
+import os
+import json
+import hashlib
+from functools import partial
+import numpy as np
+
+CHECKPOINT_DIR = 'checkpoints'
+
+
+def _config_value(value):
+    """
+    JSON value of a parameter that json cannot serialise, identical in every process.
+    Functions are named by their qualified name, partial functions by their function and arguments.
+    """
+    if isinstance(value, partial):
+        return {'function': value.func, 'args': value.args, 'keywords': value.keywords}
+    if callable(value) and hasattr(value, '__qualname__'):
+        return value.__qualname__
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    raise TypeError("Cannot key a parameter of type {0}".format(type(value).__name__))
+
+
+def config_key(config):
+    """
+    Key of an experiment configuration.
+    :param config: dict of the parameters of the experiment (numbers, strings, tuples, arrays, functions)
+    :return: hexadecimal digest
+    """
+    text = json.dumps(config, sort_keys=True, default=_config_value)
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+
+class Checkpoint:
+    """
+    Checkpoints of a long running experiment, one compressed .npz file per stage.
+    A stage saves its results so far, the number of completed replicates and the state of its RNG,
+    so that a rerun with the same configuration skips finished stages and resumes the others
+    from the last completed replicate.
+    """
+    def __init__(self, directory=CHECKPOINT_DIR, **config):
+        self.directory = os.path.join(directory, config_key(config))
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, stage):
+        """
+        Path of the file of a stage.
+        :param stage: name of the stage
+        """
+        return os.path.join(self.directory, stage + '.npz')
+
+    def save(self, stage, completed, done=False, rng=None, **arrays):
+        """
+        Save the results of a stage. The file is replaced atomically, an interruption keeps the previous checkpoint.
+        :param stage: name of the stage
+        :param completed: number of completed replicates
+        :param done: whether the stage is finished
+        :param rng: numpy.random.Generator of the stage, its state is saved
+        :param arrays: results of the stage
+        """
+        state = '' if rng is None else json.dumps(rng.bit_generator.state)
+        tmp = self.path(stage) + '.tmp.npz'
+        np.savez_compressed(tmp, completed=completed, done=done, rng_state=state, **arrays)
+        os.replace(tmp, self.path(stage))
+
+    def load(self, stage, rng=None):
+        """
+        Load the results of a stage.
+        :param stage: name of the stage
+        :param rng: numpy.random.Generator, its state is restored to the saved one
+        :return: dict of the saved arrays (with 'completed' and 'done'), None if the stage was never saved
+        """
+        if not os.path.exists(self.path(stage)):
+            return None
+
+        with np.load(self.path(stage)) as data:
+            arrays = {key: data[key] for key in data.files}
+        state = str(arrays.pop('rng_state'))
+        if rng is not None and state:
+            rng.bit_generator.state = json.loads(state)
+        arrays['completed'], arrays['done'] = int(arrays['completed']), bool(arrays['done'])
+        return arrays
@@ -2,7 +2,7 @@ import numpy as np
 import mandelbrot
 import graphic_utils
 from statistical_analysis_utils import sample_mean, recursive_sample_mean
-from monte_carlo import monte_carlo_integration
+from monte_carlo import monte_carlo_integration, area_by_iteration, area_by_sampling
 from sampling_method import halton_sequence, pure_random
 
 RE = (mandelbrot.RE_MIN, mandelbrot.RE_MAX)
@@ -24,19 +24,14 @@ def estimate_error_by_iteration(re, im, w, h, s, i, sampling_method):
     a = (re[1] - re[0]) * (im[1] - im[0])
 
     # Estimation of the area surface of Mandelbrot set for i iterations and s samples.
-    a_is, _, details = monte_carlo_integration(re, im, w, h, s, i, sampling_method=sampling_method)
+    a_is, _, details = monte_carlo_integration(re, im, w, h, s, i, sampling_method=sampling_method, check_bulbs=True)
 
     # Estimated error for range of iterations between 1 and i.
     x = range(1, i + 1)
-    y = []
 
-    # Compute error
-    for j in x:  # For each number of iteration until max_i
-        # Get number of samples which converge for j iteration
-        count = np.sum((details >= j).astype(int))
-        a_js = (count / s) * a  # Estimation of the area of the Mandelbrot set for j iteration and s samples.
-        err = 100 * (abs(a_js - a_is) / abs(a_is))  # Relative error in percent
-        y.append(err)
+    # Estimation of the area of the Mandelbrot set for j iteration and s samples, for each j until max_i
+    a_js = area_by_iteration(details, i, a)[1:]
+    y = 100 * (np.abs(a_js - a_is) / abs(a_is))  # Relative error in percent
 
     return x, y, a_is
 
@@ -58,14 +53,10 @@ def estimate_error_by_sampling(re, im, w, h, s, i, sampling_method):
 
     # Estimated error for range of iterations between 0 and s.
     x = range(1, s + 1)
-    y = []
-
-    # Compute error
-    for t in x:  # For an increasing number of sample j until s.
-        count = np.sum((details[:t+1] == i).astype(int))
-        a_it = (count / t) * a  # Estimation of the area of the Mandelbrot set for i iteration and t samples.
-        err = 100 * (abs(a_it - a_is) / abs(a_is))   # Relative error in percent
-        y.append(err)  # Error
+
+    # Estimation of the area of the Mandelbrot set for i iteration and t samples, for an increasing t until s.
+    a_it = area_by_sampling(details, i, a)
+    y = 100 * (np.abs(a_it - a_is) / abs(a_is))   # Relative error in percent
     return x, y, a_is
 
 
@@ -1,57 +1,90 @@
 import numpy as np
 import mandelbrot
 import graphic_utils
-from statistical_analysis_utils import sample_variance, sample_mean
-from monte_carlo import monte_carlo_integration
+from statistical_analysis_utils import sample_variance, sample_mean, max_relative_difference
+from monte_carlo import monte_carlo_integration, area_by_iteration, area_by_sampling
+from checkpoint import Checkpoint
 from sampling_method import halton_sequence, latin_square_chaos, orthogonal_native, pure_random
 
 RE = (mandelbrot.RE_MIN, mandelbrot.RE_MAX)
 IM = (mandelbrot.IM_MIN, mandelbrot.IM_MAX)
 WIDTH = mandelbrot.WIDTH
 HEIGHT = mandelbrot.HEIGHT
+METHODS = (pure_random, halton_sequence, latin_square_chaos, orthogonal_native)
+CHUNK_SIZE = 2000000  # Maximal number of samples evaluated in one batched escape-time pass
 
 
-def estimate_iteration_area_per_method(re, im, w, h, s, i):
+def area_stack_per_method(re, im, w, h, s, i, nb_try, by_iteration=True, methods=METHODS, check_bulbs=True, rng=None,
+                          chunk_size=CHUNK_SIZE, checkpoint=None, stage='area'):
     """
-    Compute an approximation of mandelbrot set area by maximal number of iteration
-    for 4 sampling methods: pure random, halton sequence, latin square, orthogonal
+    Compute approximations of mandelbrot set area of nb_try simulations for several sampling methods at once.
+    The samples of all methods and simulations are stacked in a (method, simulation, sample) array and
+    evaluated in one batched escape-time pass, by chunks of simulations to bound memory usage.
     :param re: tuple of (minimal, maximal) coordinates of real axis
     :param im: tuple of (minimal, maximal) coordinates of imaginary axis.
     :param w: width of the plan
     :param h: height of the plan
     :param s: Maximum number of samples
-    :param i: Number of iteration (should be minimum  with which we have reasonable convergence)
+    :param i: Number of iteration
+    :param nb_try: Number of simulations per method
+    :param by_iteration: area by maximal number of iteration j <= i (True), or by number of samples t <= s (False)
+    :param methods: sampling methods compared
+    :param check_bulbs: skip the iterations of samples in the main cardioid or the period-2 bulb
+    :param rng: numpy.random.Generator used by the sampling methods
+    :param chunk_size: maximal number of samples evaluated in one batched pass
+    :param checkpoint: Checkpoint, save the areas and RNG state after each chunk and resume from the last one saved
+    :param stage: name of the checkpoint stage
+    :return: area_stack, array of shape (methods, nb_try, i + 1) by iteration or (methods, nb_try, s) by samples
     """
+    rng = np.random.default_rng() if rng is None else rng
+
     # Area of the complex plane
     a = (re[1] - re[0]) * (im[1] - im[0])
+    area_stack = np.zeros((len(methods), nb_try, i + 1 if by_iteration else s))
+    completed = 0
+
+    data = None if checkpoint is None else checkpoint.load(stage, rng)
+    if data is not None:
+        completed = data['completed']
+        area_stack[:, :completed] = data['area_stack']
+
+    per_chunk = max(1, chunk_size // (len(methods) * s))  # Simulations per chunk
+    for start in range(completed, nb_try, per_chunk):
+        stop = min(start + per_chunk, nb_try)
+        x_samp = np.zeros((len(methods), stop - start, s))
+        y_samp = np.zeros((len(methods), stop - start, s))
+        for m, method in enumerate(methods):
+            for t in range(stop - start):
+                x_samp[m, t], y_samp[m, t] = method(w, h, s, rng)
+
+        samples = mandelbrot.grid_map_batch(x_samp, y_samp, re, im)
+        details = mandelbrot.mandelbrot_batch(samples, i, check_bulbs)
+        if by_iteration:
+            area_stack[:, start:stop] = area_by_iteration(details, i, a)
+        else:
+            area_stack[:, start:stop] = area_by_sampling(details, i, a)
+
+        if checkpoint is not None:
+            checkpoint.save(stage, stop, done=stop == nb_try, rng=rng, area_stack=area_stack[:, :stop],
+                            estimates=area_stack[:, :stop, -1])
+
+    return area_stack
 
-    # Estimation of the area surface of Mandelbrot set for i iterations and s samples.
-    a_is_rand, _, details_rand = monte_carlo_integration(re, im, w, h, s, i, sampling_method=pure_random)
-    a_is_halton, _, details_halton = monte_carlo_integration(re, im, w, h, s, i, sampling_method=halton_sequence)
-    a_is_lhs, _, details_lhs = monte_carlo_integration(re, im, w, h, s, i, sampling_method=latin_square_chaos)
-    a_is_orth, _, details_orth = monte_carlo_integration(re, im, w, h, s, i, sampling_method=orthogonal_native)
 
-    # Estimated error for range of iterations between 0 and i.
+def estimate_iteration_area_per_method(re, im, w, h, s, i):
+    """
+    Compute an approximation of mandelbrot set area by maximal number of iteration
+    for 4 sampling methods: pure random, halton sequence, latin square, orthogonal
+    :param re: tuple of (minimal, maximal) coordinates of real axis
+    :param im: tuple of (minimal, maximal) coordinates of imaginary axis.
+    :param w: width of the plan
+    :param h: height of the plan
+    :param s: Maximum number of samples
+    :param i: Number of iteration (should be minimum  with which we have reasonable convergence)
+    """
+    # Area for j iteration between 0 and i, for random, halton sequence, latin hypercube and orthogonal
     i_range = range(i + 1)
-    y_rand, y_halton, y_lhs, y_orth = [], [], [], []
-
-    # Compute error by samples for random, halton sequence and latin hypercube
-    for j in i_range:
-        # Get number of samples which converge for j iteration
-        count_rand = np.sum((details_rand >= j).astype(int))
-        count_halton = np.sum((details_halton >= j).astype(int))
-        count_lhs = np.sum((details_lhs >= j).astype(int))
-        count_orth = np.sum((details_orth >= j).astype(int))
-
-        a_rand_js = (count_rand / s) * a
-        a_halton_js = (count_halton / s) * a
-        a_lhs_js = (count_lhs / s) * a
-        a_orth_js = (count_orth / s) * a
-
-        y_rand.append(a_rand_js)
-        y_halton.append(a_halton_js)
-        y_lhs.append(a_lhs_js)
-        y_orth.append(a_orth_js)
+    y_rand, y_halton, y_lhs, y_orth = area_stack_per_method(re, im, w, h, s, i, 1)[:, 0]
 
     return i_range, y_rand, y_halton, y_lhs, y_orth
 
@@ -67,56 +100,29 @@ def estimate_samples_area_per_method(re, im, w, h, s, i):
     :param s: Maximum number of samples
     :param i: Number of iteration (should be minimum  with which we have reasonable convergence)
     """
-    # Area of the complex plane
-    a = (re[1] - re[0]) * (im[1] - im[0])
-
-    # Estimation of the area surface of Mandelbrot set for i iterations and s samples.
-    a_is_rand, _, details_rand = monte_carlo_integration(re, im, w, h, s, i, sampling_method=pure_random)
-    a_is_halton, _, details_halton = monte_carlo_integration(re, im, w, h, s, i, sampling_method=halton_sequence)
-    a_is_lhs, _, details_lhs = monte_carlo_integration(re, im, w, h, s, i, sampling_method=latin_square_chaos)
-    a_is_orth, _, details_orth = monte_carlo_integration(re, im, w, h, s, i, sampling_method=orthogonal_native)
-
-    # Estimated error for range of iterations between 0 and i.
+    # Area for t samples between 1 and s, for random, halton sequence, latin hypercube and orthogonal
     s_range = range(1, s + 1)
-    y_rand, y_halton, y_lhs, y_orth = [], [], [], []
-
-    # Compute error by samples for random, halton sequence and latin hypercube
-    for t in s_range:
-        count_rand = np.sum((details_rand[:t+1] == i).astype(int))
-        count_halton = np.sum((details_halton[:t+1] == i).astype(int))
-        count_lhs = np.sum((details_lhs[:t+1] == i).astype(int))
-        count_orth = np.sum((details_orth[:t+1] == i).astype(int))
-
-
-        a_rand_it = (count_rand / t) * a
-        a_halton_it = (count_halton / t) * a
-        a_lhs_it = (count_lhs / t) * a
-        a_orth_it = (count_orth / t) * a
-
-        y_rand.append(a_rand_it)
-        y_halton.append(a_halton_it)
-        y_lhs.append(a_lhs_it)
-        y_orth.append(a_orth_it)
+    y_rand, y_halton, y_lhs, y_orth = area_stack_per_method(re, im, w, h, s, i, 1, by_iteration=False)[:, 0]
 
     return s_range, y_rand, y_halton, y_lhs, y_orth
 
 
-def study_iteration_convergence(s, i, re=RE, im=IM, w=WIDTH, h=HEIGHT):
+def study_iteration_convergence(s, i, re=RE, im=IM, w=WIDTH, h=HEIGHT, checkpoint_dir=None):
     """
     Examine which sampling method requires fewer samples to converge.
     Get abs(A_js - A_is) for all j < i, then plot the results.
     Study area, variance and maximal difference.
+    With a checkpoint directory, the areas are saved after each chunk of simulations,
+    and a rerun with the same parameters resumes from the last one saved.
     """
     nb_try = 50
-    area_stack = np.zeros((4, nb_try, i + 1))
+    checkpoint = None
+    if checkpoint_dir is not None:
+        checkpoint = Checkpoint(checkpoint_dir, study='iteration_convergence', s=s, i=i, re=re, im=im, w=w, h=h, nb_try=nb_try)
 
     print("Estimating area...")
-    for t in range(nb_try):
-        x_range, y_rand, y_halton, y_lhs, y_orth = estimate_iteration_area_per_method(re, im, w, h, s, i)
-        area_stack[0][t] = np.array(y_rand)
-        area_stack[1][t] = np.array(y_halton)
-        area_stack[2][t] = np.array(y_lhs)
-        area_stack[3][t] = np.array(y_orth)
+    x_range = range(i + 1)
+    area_stack = area_stack_per_method(re, im, w, h, s, i, nb_try, checkpoint=checkpoint)
 
     print("Computing variance ...")
     x_diff_range = range(0, i + 1, 10)
@@ -129,44 +135,29 @@ def study_iteration_convergence(s, i, re=RE, im=IM, w=WIDTH, h=HEIGHT):
 
     print("Computing maximal difference...")
     x_diff_range = range(0, i + 1, 10)
-    max_diff_stack = [[], [], [], []]
-    for j in x_diff_range:
-        d_r, d_h, d_l, d_o = 0, 0, 0, 0
-
-        for t in range(nb_try):
-            for u in range(t + 1, nb_try):
-                d_r = max(d_r, abs(area_stack[0][t][j] - area_stack[0][u][j]) / abs(area_stack[0][t][j] + area_stack[0][u][j]))
-                d_h = max(d_h, abs(area_stack[1][t][j] - area_stack[1][u][j]) / abs(area_stack[1][t][j] + area_stack[1][u][j]))
-                d_l = max(d_l, abs(area_stack[2][t][j] - area_stack[2][u][j]) / abs(area_stack[2][t][j] + area_stack[2][u][j]))
-                d_o = max(d_o, abs(area_stack[3][t][j] - area_stack[3][u][j]) / abs(area_stack[3][t][j] + area_stack[3][u][j]))
-
-        max_diff_stack[0].append(d_r)
-        max_diff_stack[1].append(d_h)
-        max_diff_stack[2].append(d_l)
-        max_diff_stack[3].append(d_o)
+    max_diff_stack = max_relative_difference(area_stack[:, :, x_diff_range], axis=1)  # For each method and j
 
     graphic_utils.plot_convergence(np.array(x_range), area_stack, 'Number of iteration i')
     graphic_utils.plot_convergence_difference(np.array(x_diff_range), max_diff_stack, 'Number of iteration i')
     graphic_utils.plot_convergence_variance(np.array(x_diff_range), variance_stack, 'Number of iteration i')
 
 
-def study_samples_convergence(s, i, re=RE, im=IM, w=WIDTH, h=HEIGHT):
+def study_samples_convergence(s, i, re=RE, im=IM, w=WIDTH, h=HEIGHT, checkpoint_dir=None):
     """
     Examine which sampling method requires fewer samples to converge.
     Get abs(A_it - A_is) for all t < s, then plot the results.
     Study area, variance and maximal difference.
+    With a checkpoint directory, the areas are saved after each chunk of simulations,
+    and a rerun with the same parameters resumes from the last one saved.
     """
     nb_try = 100
-    area_stack = np.zeros((4, nb_try, s))
-
+    checkpoint = None
+    if checkpoint_dir is not None:
+        checkpoint = Checkpoint(checkpoint_dir, study='samples_convergence', s=s, i=i, re=re, im=im, w=w, h=h, nb_try=nb_try)
 
     print("Estimating area...")
-    for t in range(nb_try):
-        x_range, y_rand, y_halton, y_lhs, y_orth = estimate_samples_area_per_method(re, im, w, h, s, i)
-        area_stack[0][t] = np.array(y_rand)
-        area_stack[1][t] = np.array(y_halton)
-        area_stack[2][t] = np.array(y_lhs)
-        area_stack[3][t] = np.array(y_orth)
+    x_range = range(1, s + 1)
+    area_stack = area_stack_per_method(re, im, w, h, s, i, nb_try, by_iteration=False, checkpoint=checkpoint)
 
     print("Computing variance...")
     x_diff_range = range(0, s, 50)
@@ -179,20 +170,7 @@ def study_samples_convergence(s, i, re=RE, im=IM, w=WIDTH, h=HEIGHT):
 
     print("Computing maximal difference...")
     x_diff_range = range(0, s, 50)
-    max_diff_stack = [[], [], [], []]
-    for j in x_diff_range:
-        d_r, d_l, d_h, d_o = 0, 0, 0, 0
-        for t in range(nb_try):
-            for u in range(t + 1, nb_try):
-                d_r = max(d_r, abs(area_stack[0][t][j] - area_stack[0][u][j]) / abs(area_stack[0][t][j] + area_stack[0][u][j]))
-                d_l = max(d_l, abs(area_stack[1][t][j] - area_stack[1][u][j]) / abs(area_stack[1][t][j] + area_stack[1][u][j]))
-                d_h = max(d_h, abs(area_stack[2][t][j] - area_stack[2][u][j]) / abs(area_stack[2][t][j] + area_stack[2][u][j]))
-                d_o = max(d_o, abs(area_stack[3][t][j] - area_stack[3][u][j]) / abs(area_stack[3][t][j] + area_stack[3][u][j]))
-
-        max_diff_stack[0].append(d_r)
-        max_diff_stack[1].append(d_l)
-        max_diff_stack[2].append(d_h)
-        max_diff_stack[3].append(d_o)
+    max_diff_stack = max_relative_difference(area_stack[:, :, x_diff_range], axis=1)  # For each method and t
 
     graphic_utils.plot_convergence(np.array(x_range), area_stack, 'Number of sample s')
     graphic_utils.plot_convergence_difference(np.array(x_diff_range), max_diff_stack, 'Number of sample s')
@@ -211,15 +189,9 @@ def study_iteration_convergence_single_method(s, i, re=RE, im=IM, w=WIDTH, h=HEI
     print("Estimating area...")
     for t in range(nb_try):
         a = (re[1] - re[0]) * (im[1] - im[0])
-        a_is_rand, _, details_rand = monte_carlo_integration(re, im, w, h, s, i, sampling_method=pure_random)
+        a_is_rand, _, details_rand = monte_carlo_integration(re, im, w, h, s, i, sampling_method=pure_random, check_bulbs=True)
         i_range = range(i + 1)
-        y_rand = []
-        for j in i_range:
-            count_rand = np.sum((details_rand >= j).astype(int))
-            a_rand_js = (count_rand / s) * a
-            y_rand.append(a_rand_js)
-
-        area_stack[t] = np.array(y_rand)
+        area_stack[t] = area_by_iteration(details_rand, i, a)
 
     graphic_utils.plot_convergence_single_method(np.array(i_range), area_stack, 'Maximal number of iterations i')
 
@@ -238,13 +210,7 @@ def study_samples_convergence_single_method(s, i, re=RE, im=IM, w=WIDTH, h=HEIGH
     for tr in range(nb_try):
         a_is_rand, _, details_rand = monte_carlo_integration(re, im, w, h, s, i, sampling_method=pure_random)
         s_range = range(1, s + 1)
-        y_rand = []
-        for t in s_range:
-            count_rand = np.sum((details_rand[:t+1] == i).astype(int))
-            a_rand_it = (count_rand / t) * a
-            y_rand.append(a_rand_it)
-
-        area_stack[tr] = np.array(y_rand)
+        area_stack[tr] = area_by_sampling(details_rand, i, a)
 
     graphic_utils.plot_convergence_single_method(np.array(s_range), area_stack, 'Number of samples s')
 
@@ -0,0 +1,179 @@
+import os
+import hashlib
+from collections import OrderedDict
+import numpy as np
+import mandelbrot
+
+MAX_BYTES = 64 * 2**20  # Memory budget of the states kept in memory
+
+
+class EscapeState:
+    """
+    Resumable escape-time state of a set of samples.
+    Keep for each sample the last value of z, the number of iteration done and whether it diverged,
+    so that a run at a higher maximal number of iteration continues a previous run instead of restarting.
+    """
+    def __init__(self, c, check_bulbs=False):
+        self.c = np.asarray(c, dtype=np.complex128).ravel()
+        self.z = np.zeros(self.c.size, dtype=np.complex128)
+        self.n = np.zeros(self.c.size, dtype=np.int64)
+        self.escaped = np.zeros(self.c.size, dtype=bool)
+        self.max_iter = 0
+
+        # Points of the main cardioid and period-2 bulb never diverge, they are never iterated.
+        self.interior = np.zeros(self.c.size, dtype=bool)
+        if check_bulbs:
+            self.interior = mandelbrot.in_main_cardioid(self.c) | mandelbrot.in_period2_bulb(self.c)
+
+    def advance(self, max_iter):
+        """
+        Continue the iterations of the points which did not diverge, up to max_iter.
+        :param max_iter: Maximal number of iteration
+        """
+        if max_iter <= self.max_iter:
+            return
+
+        active = ~(self.escaped | self.interior)
+        n, z = mandelbrot.mandelbrot_resume(self.c[active], self.z[active], self.max_iter, max_iter)
+        self.n[active], self.z[active] = n, z
+        self.escaped[active] = ~(np.abs(z) <= 2)
+        self.n[self.interior] = max_iter
+        self.max_iter = max_iter
+
+    @property
+    def nbytes(self):
+        """
+        Memory used by the arrays of the state.
+        """
+        return self.c.nbytes + self.z.nbytes + self.n.nbytes + self.escaped.nbytes + self.interior.nbytes
+
+    def counts(self, max_iter):
+        """
+        Number of iteration of each sample, as returned by mandelbrot(c, max_iter).
+        :param max_iter: Maximal number of iteration (advance the state if needed)
+        :return: Integer array of number of iteration until divergence or max_iter.
+        """
+        self.advance(max_iter)
+        return np.minimum(self.n, max_iter)
+
+    def save(self, path):
+        """
+        Save the state into a compressed .npz file.
+        :param path: path of the file
+        """
+        np.savez_compressed(path, c=self.c, z=self.z, n=self.n, escaped=self.escaped,
+                            interior=self.interior, max_iter=self.max_iter)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a state saved with save.
+        :param path: path of the file
+        :return: EscapeState
+        """
+        with np.load(path) as data:
+            state = cls(data['c'])
+            state.z, state.n, state.escaped = data['z'], data['n'], data['escaped']
+            state.interior, state.max_iter = data['interior'], int(data['max_iter'])
+        return state
+
+
+class IterationCache:
+    """
+    Cache of escape-time states, keyed by the sample coordinates and the RNG seed used to draw them.
+    Samples drawn without a seed can never be drawn again, their states are not cached.
+    States are kept in memory up to max_bytes (least recently used evicted first), and persisted as .npz files
+    when a directory is given.
+    """
+    def __init__(self, directory=None, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.states = OrderedDict()
+        self.nbytes = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(c, seed=None):
+        """
+        Key of a set of samples.
+        :param c: array of complex samples
+        :param seed: seed of the RNG used to draw the samples
+        :return: hexadecimal digest
+        """
+        digest = hashlib.sha1(np.ascontiguousarray(c, dtype=np.complex128).tobytes())
+        digest.update(repr(seed).encode())
+        return digest.hexdigest()
+
+    def get(self, c, seed=None, check_bulbs=False):
+        """
+        Escape-time state of a set of samples: cached one if any, new one otherwise.
+        :param c: array of complex samples
+        :param seed: seed of the RNG used to draw the samples
+        :param check_bulbs: skip points of the main cardioid and period-2 bulb for a new state
+        :return: EscapeState
+        """
+        if seed is None:
+            return EscapeState(c, check_bulbs)
+
+        key = self.key(c, seed)
+        if key in self.states:
+            self.states.move_to_end(key)
+            return self.states[key]
+
+        if self.directory is not None:
+            path = os.path.join(self.directory, key + '.npz')
+            if os.path.exists(path):
+                state = EscapeState.load(path)
+                if np.array_equal(state.c, np.ravel(c)):
+                    self.store(key, state)
+                    return state
+
+        state = EscapeState(c, check_bulbs)
+        self.store(key, state)
+        return state
+
+    def store(self, key, state):
+        """
+        Keep a state in memory, and evict the least recently used ones beyond the memory budget.
+        :param key: key of the samples of the state
+        :param state: EscapeState
+        """
+        if key in self.states:
+            self.nbytes -= self.states.pop(key).nbytes
+        self.states[key] = state
+        self.nbytes += state.nbytes
+
+        while self.nbytes > self.max_bytes and len(self.states) > 1:
+            _, old_state = self.states.popitem(last=False)
+            self.nbytes -= old_state.nbytes
+
+    def put(self, state, seed=None):
+        """
+        Store a state in the cache (and on disk if a directory is set), states without seed are not stored.
+        :param state: EscapeState
+        :param seed: seed of the RNG used to draw the samples
+        """
+        if seed is None:
+            return
+
+        key = self.key(state.c, seed)
+        self.store(key, state)
+        if self.directory is not None:
+            state.save(os.path.join(self.directory, key + '.npz'))
+
+    def counts(self, c, max_iter, seed=None, check_bulbs=False):
+        """
+        Number of iteration of each sample for max_iter, reusing the iterations done by previous runs.
+        :param c: array of complex samples
+        :param max_iter: Maximal number of iteration
+        :param seed: seed of the RNG used to draw the samples
+        :param check_bulbs: skip points of the main cardioid and period-2 bulb
+        :return: Integer array of number of iteration until divergence or max_iter.
+        """
+        state = self.get(c, seed, check_bulbs)
+        advanced = max_iter > state.max_iter
+        counts = state.counts(max_iter)
+        if advanced:
+            self.put(state, seed)
+        return counts.reshape(np.shape(c))
@@ -5,12 +5,44 @@ import statistical_analysis
 import statistical_analysis_utils
 import study_mandelbrot
 
+from checkpoint import Checkpoint, CHECKPOINT_DIR
 from sampling_method import pure_random, halton_sequence, latin_square_chaos, orthogonal_native
 import numpy as np
 from scipy import stats
 
 
-def assignment_1_main():
+def convergence_test(checkpoint, stage, runs, sampling_method, title, re, im, w, h):
+    """
+    Run the when-to-stop algorithm several times and collect the number of simulations it required.
+    The numbers of simulations and the RNG state are saved after each run, and each run saves its running statistics
+    after each simulation: an interrupted test resumes from the last simulation.
+    """
+    rng = np.random.default_rng()
+    data = checkpoint.load(stage, rng)
+    res = [] if data is None else list(data['res'])
+
+    for j in range(len(res), runs):
+        print(title)
+        x_, s2_, min, max, it = statistical_analysis.confidence_interval_estimate(0.0025, 50, 2500, 700, re, im, w, h,
+                                                                                sampling_method, rng=rng,
+                                                                                checkpoint=checkpoint,
+                                                                                stage='{0}-{1}'.format(stage, j))
+        res.append(it)
+        checkpoint.save(stage, len(res), done=len(res) == runs, rng=rng, res=np.array(res))
+        print('Iterations it = ', it)
+        print("Sample mean     x_  = ", x_)
+        print("Sample variance s2_ = ", s2_)
+        print("Confidence interval = [{:5f}, {:5f}]".format(min, max))
+
+    return np.array(res)
+
+
+def assignment_1_main(checkpoint_dir=CHECKPOINT_DIR):
+    """
+    Demonstration of the results of the report.
+    Results of parts 3 and 4 are checkpointed in checkpoint_dir: a rerun skips finished stages
+    and resumes interrupted ones.
+    """
     print("====================================")
     print("=== 1 - Visualize Mandelbrot set ===")
     print("====================================")
@@ -73,23 +105,32 @@ def assignment_1_main():
     # the fixed number of simulation
     sims = 50
 
+    # Stages of parts 3 and 4 are saved, a rerun with the same configuration skips the finished ones.
+    checkpoint = Checkpoint(checkpoint_dir, re=re, im=im, w=w, h=h, sims=sims)
+
     print("=== Study confidence interval by sampling method, Fixed Simulations ===")
     print("=== Pure random, Simulations = {0} ===".format(sims))
-    x_, s2_, min, max = statistical_analysis.confidence_interval_estimate_fixed(sims, 2500, 600, re, im, w, h, pure_random)
+    x_, s2_, min, max = statistical_analysis.confidence_interval_estimate_fixed(
+        sims, 2500, 600, re, im, w, h, pure_random, checkpoint=checkpoint,
+        stage='fixed_pure_random')
     print("Sample mean     x_  = ", x_)
     print("Sample variance s2_ = ", s2_)
     print("Confidence interval [{:5f}, {:5f}] ".format(min, max))
     print("Done")
 
     print("=== Latin Hypercube, Simulations = {0} ===".format(sims))
-    x_, s2_, min, max = statistical_analysis.confidence_interval_estimate_fixed(sims, 2500, 600, re, im, w, h, latin_square_chaos)
+    x_, s2_, min, max = statistical_analysis.confidence_interval_estimate_fixed(
+        sims, 2500, 600, re, im, w, h, latin_square_chaos, checkpoint=checkpoint,
+        stage='fixed_latin_square')
     print("Sample mean     x_  = ", x_)
     print("Sample variance s2_ = ", s2_)
     print("Confidence interval = [{:5f}, {:5f}]".format(min, max))
     print("Done")
 
     print("=== Orthogonal Sampling, Simulations = {0} ===".format(sims))
-    x_, s2_, min, max = statistical_analysis.confidence_interval_estimate_fixed(sims, 10000, 1000, re, im, w, h, orthogonal_native)
+    x_, s2_, min, max = statistical_analysis.confidence_interval_estimate_fixed(
+        sims, 10000, 1000, re, im, w, h, orthogonal_native, checkpoint=checkpoint,
+        stage='fixed_orthogonal')
     print("Sample mean     x_  = ", x_)
     print("Sample variance s2_ = ", s2_)
     print("Confidence interval = [{:5f}, {:5f}]".format(min, max))
@@ -97,7 +138,9 @@ def assignment_1_main():
 
     print("=== Study confidence interval by sampling method, When to Stop Algorithm ===")
     print("=== Pure random ===")
-    x_, s2_, min, max, it = statistical_analysis.confidence_interval_estimate(0.008, 50, 10000, 800, re, im, w, h, pure_random)
+    x_, s2_, min, max, it = statistical_analysis.confidence_interval_estimate(
+        0.008, 50, 10000, 800, re, im, w, h, pure_random, checkpoint=checkpoint,
+        stage='stop_pure_random')
     print('Iterations it = ', it)
     print("Sample mean     x_  = ", x_)
     print("Sample variance s2_ = ", s2_)
@@ -105,7 +148,9 @@ def assignment_1_main():
     print("Done")
 
     print("=== Latin Hypercube ===")
-    x_, s2_, min, max, it = statistical_analysis.confidence_interval_estimate(0.008, 50, 10000, 800, re, im, w, h, latin_square_chaos)
+    x_, s2_, min, max, it = statistical_analysis.confidence_interval_estimate(
+        0.008, 50, 10000, 800, re, im, w, h, latin_square_chaos, checkpoint=checkpoint,
+        stage='stop_latin_square')
     print('Iterations it = ', it)
     print("Sample mean     x_  = ", x_)
     print("Sample variance s2_ = ", s2_)
@@ -113,7 +158,9 @@ def assignment_1_main():
     print("Done")
 
     print("=== Orthogonal Sampling ===")
-    x_, s2_, min, max, it = statistical_analysis.confidence_interval_estimate(0.008, 50, 10000, 1000, re, im, w, h, orthogonal_native)
+    x_, s2_, min, max, it = statistical_analysis.confidence_interval_estimate(
+        0.008, 50, 10000, 1000, re, im, w, h, orthogonal_native, checkpoint=checkpoint,
+        stage='stop_orthogonal')
     print('Iterations it = ', it)
     print("Sample mean     x_  = ", x_)
     print("Sample variance s2_ = ", s2_)
@@ -124,7 +171,9 @@ def assignment_1_main():
     print("===================================================")
 
     print("=== Halton Sampling, Fixed Simulations, Simulations = {0} ===".format(sims))
-    x_, s2_, min, max = statistical_analysis.confidence_interval_estimate_fixed(sims, 10000, 1000, re, im, w, h, halton_sequence)
+    x_, s2_, min, max = statistical_analysis.confidence_interval_estimate_fixed(
+        sims, 10000, 1000, re, im, w, h, halton_sequence, checkpoint=checkpoint,
+        stage='fixed_halton')
     print("Sample mean     x_  = ", x_)
     print("Sample variance s2_ = ", s2_)
     print("Confidence interval = [{:5f}, {:5f}]".format(min, max))
@@ -135,28 +184,14 @@ def assignment_1_main():
 
     runs = 30
 
-    res_orth = []
-    for j in range(0, runs):    
-        print("=== Orthogonal Sampling ===")
-        x_, s2_, min, max, it = statistical_analysis.confidence_interval_estimate(0.0025, 50, 2500, 700, re, im, w, h, orthogonal_native)
-        res_orth.append(it) 
-        print('Iterations it = ', it)
-        print("Sample mean     x_  = ", x_)
-        print("Sample variance s2_ = ", s2_)
-        print("Confidence interval = [{:5f}, {:5f}]".format(min, max))
+    res_orth = convergence_test(checkpoint, 'convergence_orthogonal', runs, orthogonal_native,
+                                "=== Orthogonal Sampling ===", re, im, w, h)
 
     print('Mean Iterations Required Orthogonal', np.mean(np.array(res_orth)))
     print('Variance Iterations Required Orthogonal', statistical_analysis_utils.sample_variance(np.array(res_orth)))
 
-    res_hal = []
-    for j in range(0, runs):    
-        print("=== Halton Sequence ===, When to Stop Algorithm")
-        x_, s2_, min, max, it = statistical_analysis.confidence_interval_estimate(0.0025, 50, 2500, 700, re, im, w, h, halton_sequence)
-        res_hal.append(it)
-        print('Iterations it = ', it)
-        print("Sample mean     x_  = ", x_)
-        print("Sample variance s2_ = ", s2_)
-        print("Confidence interval = [{:5f}, {:5f}]".format(min, max))
+    res_hal = convergence_test(checkpoint, 'convergence_halton', runs, halton_sequence,
+                               "=== Halton Sequence ===, When to Stop Algorithm", re, im, w, h)
 
     print('Mean Iterations Required Halton', np.mean(np.array(res_hal)))
     print('Variance Iterations Required Halton', statistical_analysis_utils.sample_variance(np.array(res_hal)))
@@ -167,8 +202,8 @@ def assignment_1_main():
     print("================================================")
     print("=== 4 - Generate Variance Graphs ===")
     print("================================================")
-    investigate_error.study_samples_convergence(50000, 1000)  # Report: s=50000, i=1000
-    investigate_error.study_iteration_convergence(10000, 1500)
+    investigate_error.study_samples_convergence(50000, 1000, checkpoint_dir=checkpoint_dir)  # Report: s=50000, i=1000
+    investigate_error.study_iteration_convergence(10000, 1500, checkpoint_dir=checkpoint_dir)
 
 if __name__ == '__main__':
     assignment_1_main()
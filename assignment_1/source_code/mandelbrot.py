@@ -1,29 +1,73 @@
 import matplotlib.pyplot as plt
 import numpy as np
-from PIL import Image, ImageDraw
+import queue
+import threading
+from decimal import Decimal, localcontext
+from multiprocessing import Pool, shared_memory
+from PIL import Image, ImageColor
+import numba_backend
 from graphic_utils import palette
+from tile_cache import TileCache
 
 WIDTH = 600
 HEIGHT = 400
 MAX_ITER = 100
 RE_MIN, RE_MAX = -2.02, 0.49
 IM_MIN, IM_MAX = -1.15, 1.15
+TILE_SIZE = 64  # Width and height (in pixels) of the tiles rendered by the tiled mode
+QUADTREE_DEPTH = 8  # Number of refinements of the boundary cells for the deterministic area bounds
+EDGE_POINTS = 2  # Number of points tested per edge of a quadtree cell (corners included)
+PERIOD_TOL = 1e-12  # Distance under which an orbit is considered to repeat (periodicity checking)
+PROGRESSIVE_PASSES = (8, 4, 1)  # Downsampling factors of the successive passes of the progressive rendering
+ZOOM_FACTOR = 10  # Zoom between two levels of the tile cache (zoom of a click of the zoom tool)
+LEVEL_TOL = 1e-6  # Tolerance on the zoom level of a grid for the tile cache to be used
+DEEP_ZOOM_WIDTH = 1e-10  # Width of the real axis under which the zoom tool switches to perturbation rendering
+REFERENCE_DIGITS = 20  # Significant digits of the reference orbit in addition to those needed by the zoom
+DEEP_ITER_PER_DECADE = 200  # Maximal number of iteration added per decade of zoom in deep zoom mode
+CANCEL_CHECK = 64  # Number of iterations of the perturbation rendering between two checks of the cancel event
+POLL_INTERVAL = 50  # Interval (in ms) at which the zoom tool draws the passes rendered in the background
+
+# Termination reasons of the escape-time iteration (return_reason=True)
+STOP_ESCAPE = 0  # |z| > 2: c is not in the set
+STOP_CYCLE = 1  # The orbit repeats: c is in the set
+STOP_BULB = 2  # c lies in the main cardioid or the period-2 bulb
+STOP_MAX_ITER = 3  # Maximal number of iteration reached
+
+# Per-process view of the shared output buffer of the tiled rendering mode.
+_shared_grid = {}
 
 
 class ZoomTool:
     """
     To clean - simple zoom tool (only zooming right now).
     Zoom x10 at the clicked point in the image window.
+    The new image is rendered progressively on a background thread (see mandelbrot_set_progressive):
+    each pass is drawn as soon as it lands, and a newer click cancels the render in progress.
+    Once the window is narrower than DEEP_ZOOM_WIDTH, it is kept as a high precision center and offsets from it
+    (the axes show the offsets), and images are rendered by perturbation (see mandelbrot_set_deep) with a maximal
+    number of iteration growing with the zoom (see deep_max_iter).
     """
-    def __init__(self, ax, re, im):
+    def __init__(self, ax, re, im, image=None):
         self.ax = ax
         self.press = None
         self.re = re
         self.im = im
+        self.image = image  # AxesImage updated by the passes
+        self.tiles = TileCache()  # Tiles of previously viewed regions
+        self.center = None  # High precision center of the window in deep zoom mode
+        self.passes = queue.Queue()  # (cancel event, image, extent) of the rendered passes
+        self.cancel = threading.Event()  # Cancel event of the render in progress
+        self.worker = None
+        self.timer = None
 
     def connect(self):
         self.cidpress = self.ax.figure.canvas.mpl_connect('button_press_event', self.on_press)
 
+        # Passes are drawn from the GUI thread, matplotlib is not thread-safe.
+        self.timer = self.ax.figure.canvas.new_timer(interval=POLL_INTERVAL)
+        self.timer.add_callback(self.update)
+        self.timer.start()
+
     def on_press(self, event):
         scale_factor = 0.1  # scale
         re, im = self.re, self.im  # Current real axis x (min, max) and imaginary axis y (min, max)
@@ -49,15 +93,71 @@ class ZoomTool:
         self.re = (re_min, re_max)
         self.im = (im_min, im_max)
 
-        print("Real (min, max) = ", re_min, re_max)
-        print("Imaginary (min, max) = ", im_min, im_max)
-
-        # Compute new fractal and refresh plot
-        new_img = mandelbrot_set(self.re, self.im)
-        self.ax.imshow(new_img, extent=[re_min, re_max, im_min, im_max])  # 
+        if self.center is not None or re_max - re_min < DEEP_ZOOM_WIDTH:
+            # Deep zoom: the clicked point is an offset from the center, in deep zoom mode.
+            with localcontext() as ctx:
+                ctx.prec = max(ctx.prec, int(np.ceil(-np.log10(re_max - re_min))) + REFERENCE_DIGITS)
+                self.center = (Decimal(x), Decimal(y)) if self.center is None else \
+                    (self.center[0] + Decimal(x), self.center[1] + Decimal(y))
+            self.re = (re_min - x, re_max - x)
+            self.im = (im_min - y, im_max - y)
+            print("Center = ", self.center[0], self.center[1])
+            print("Width = ", re_max - re_min)
+        else:
+            print("Real (min, max) = ", re_min, re_max)
+            print("Imaginary (min, max) = ", im_min, im_max)
+
+        # Cancel the render in progress and compute new fractal in the background
+        self.render(self.re, self.im)
+
+    def render(self, re, im):
+        """
+        Start the progressive render of a new image window on a background thread, cancelling the previous one.
+        :param re: tuple of minimal and maximal coordinates from the real axis (offsets from the center in deep zoom mode)
+        :param im: tuple of minimal and maximal coordinates from the imaginary axis (idem)
+        """
+        self.cancel.set()
+        self.cancel = threading.Event()
+        self.worker = threading.Thread(target=self._render, args=(re, im, self.center, self.cancel), daemon=True)
+        self.worker.start()
+
+    def _render(self, re, im, center, cancel):
+        """
+        Background worker: queue the passes of the render until it is cancelled.
+        """
+        if center is not None:
+            img = mandelbrot_set_deep(center, re, im, deep_max_iter(re), cancel=cancel)
+            images = [] if img is None else [img]
+        else:
+            images = mandelbrot_set_progressive(re, im, cancel=cancel, cache=self.tiles)
+
+        for img in images:
+            self.passes.put((cancel, img, [re[0], re[1], im[0], im[1]]))
+
+    def update(self):
+        """
+        Timer callback: draw the last pass rendered for the current image window, and refresh plot.
+        """
+        latest = None
+        while not self.passes.empty():
+            cancel, img, extent = self.passes.get()
+            if cancel is self.cancel:
+                latest = img, extent
+
+        if latest is None:
+            return
+        img, extent = latest
+        if self.image is None:
+            self.image = self.ax.imshow(img, extent=extent)
+        else:
+            self.image.set_data(img)
+            self.image.set_extent(extent)
         self.ax.figure.canvas.draw_idle()
 
     def disconnect(self):
+        self.cancel.set()
+        if self.timer is not None:
+            self.timer.stop()
         self.ax.figure.canvas.mpl_disconnect(self.cidpress)
 
 
@@ -69,12 +169,12 @@ def mandelbrot_visualizer_tool(img):
     fig = plt.figure()
     ax = fig.subplots()
 
-    ax.imshow(img, extent=(RE_MIN, RE_MAX, IM_MIN, IM_MAX))  #
+    image = ax.imshow(img, extent=(RE_MIN, RE_MAX, IM_MIN, IM_MAX))  #
     # ax.axis("off")
     ax.set_title("Mandelbrot")
 
     # Add simple zoom in tool.
-    plot_with_zoom = ZoomTool(ax, (RE_MIN, RE_MAX), (IM_MIN, IM_MAX))
+    plot_with_zoom = ZoomTool(ax, (RE_MIN, RE_MAX), (IM_MIN, IM_MAX), image)
     plot_with_zoom.connect()
     plt.show()
     plot_with_zoom.disconnect()
@@ -96,6 +196,24 @@ def grid_map(x, y, re=(RE_MIN, RE_MAX), im=(IM_MIN, IM_MAX), w=WIDTH, h=HEIGHT):
     return complex(r_part, i_part)
 
 
+def grid_map_batch(x, y, re=(RE_MIN, RE_MAX), im=(IM_MIN, IM_MAX), w=WIDTH, h=HEIGHT):
+    """
+    Conversion of arrays of grid points to the complex plane (vectorized grid_map).
+    :param x: array of x coordinates from the grid
+    :param y: array of y coordinates from the grid
+    :param re: tuple of minimal and maximal coordinates from the real axis
+    :param im: tuple of minimal and maximal coordinates from the imaginary axis
+    :param w: width of the grid
+    :param h: height of the grid
+    :return: complex128 array of the complex coordinates (r, i) of the points (x, y)
+    """
+    x, y = np.broadcast_arrays(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64))
+    c = np.empty(x.shape, dtype=np.complex128)
+    c.real = re[0] + (x / w) * (re[1] - re[0])
+    c.imag = im[0] + (y / h) * (im[1] - im[0])
+    return c
+
+
 def get_color(it):
     """
     Returns a hexadecimal colour to fill individual pixel based on number of iterations
@@ -106,41 +224,370 @@ def get_color(it):
     return palette[int(round(color))]
 
 
-def mandelbrot(c, max_iter=MAX_ITER):
+def in_main_cardioid(c):
+    """
+    Closed-form test of membership to the main cardioid of the Mandelbrot set.
+    :param c: Complex number or array of complex numbers.
+    :return: True (or boolean array) if c lies in the main cardioid.
+    """
+    x, y = c.real - 0.25, c.imag
+    q = x**2 + y**2
+    return q * (q + x) <= 0.25 * y**2
+
+
+def in_period2_bulb(c):
+    """
+    Closed-form test of membership to the period-2 bulb (disk of radius 1/4 centered on -1).
+    :param c: Complex number or array of complex numbers.
+    :return: True (or boolean array) if c lies in the period-2 bulb.
+    """
+    return (c.real + 1)**2 + c.imag**2 <= 0.0625
+
+
+def mandelbrot(c, max_iter=MAX_ITER, check_bulbs=False, check_period=False, tol=PERIOD_TOL, return_reason=False):
     """
     Estimate if f(z)=z^2 + c diverges with complex number c.
+    With periodicity checking, a snapshot of the orbit is taken at every power of two iterations (Brent)
+    and the point is declared bounded (max_iter is returned) once the orbit comes back to the snapshot.
     :param c: Complex number (point from the grid) to use.
     :param max_iter: Maximal number of iteration fixed to consider complex number in mandelbrot set.
+    :param check_bulbs: return max_iter immediately if c lies in the main cardioid or the period-2 bulb.
+    :param check_period: return max_iter as soon as a cycle of the orbit is detected.
+    :param tol: distance under which the orbit is considered to repeat.
+    :param return_reason: also return the termination reason (STOP_ESCAPE, STOP_CYCLE, STOP_BULB, STOP_MAX_ITER).
     :return: Number of iteration until divergence or a fixed maximal number of iteration.
     """
+    if check_bulbs and (in_main_cardioid(c) or in_period2_bulb(c)):
+        return (max_iter, STOP_BULB) if return_reason else max_iter
+
+    if numba_backend.use_numba() and not check_period and not return_reason:
+        return numba_backend.escape_time(c.real, c.imag, 0., 0., 0, max_iter)[0]
+
     z = 0
     n = 0
+    old, period, limit = 0, 0, 1
     while abs(z) <= 2 and n < max_iter:
         z = z**2 + c
         n += 1
 
+        if check_period and abs(z) <= 2:
+            if abs(z - old) < tol:
+                return (max_iter, STOP_CYCLE) if return_reason else max_iter
+            period += 1
+            if period == limit:
+                old, period, limit = z, 0, 2 * limit
+
+    if return_reason:
+        return n, STOP_ESCAPE if not abs(z) <= 2 else STOP_MAX_ITER
     return n
 
 
-def mandelbrot_detailed(c, max_iter=MAX_ITER):
+def mandelbrot_batch(c, max_iter=MAX_ITER, check_bulbs=False, check_period=False, tol=PERIOD_TOL):
+    """
+    Vectorized version of mandelbrot: estimate if f(z)=z^2 + c diverges for an array of complex numbers c.
+    Only the points which have not diverged yet are iterated (compacted active set), so
+    diverged points stop costing work. Results are identical to calling mandelbrot on each point.
+    :param c: Array of complex numbers (points from the grid) to use.
+    :param max_iter: Maximal number of iteration fixed to consider complex number in mandelbrot set.
+    :param check_bulbs: points in the main cardioid or the period-2 bulb get max_iter without being iterated.
+    :param check_period: points get max_iter as soon as a cycle of their orbit is detected (see mandelbrot).
+    :param tol: distance under which the orbit is considered to repeat.
+    :return: Integer array (same shape as c) of number of iteration until divergence or max_iter.
+    """
+    c = np.asarray(c, dtype=np.complex128)
+    counts = np.full(c.shape, max_iter, dtype=np.int64)
+
+    idx = np.arange(c.size)
+    if check_bulbs:
+        flat = c.ravel()
+        idx = idx[~(in_main_cardioid(flat) | in_period2_bulb(flat))]
+
+    c_active = c.ravel()[idx]
+    if check_period:
+        counts.flat[idx] = _mandelbrot_period(c_active, max_iter, tol)
+    else:
+        counts.flat[idx], _ = mandelbrot_resume(c_active, np.zeros_like(c_active), 0, max_iter)
+    return counts
+
+
+def _mandelbrot_period(c, max_iter, tol):
+    """
+    Escape-time iteration with periodicity checking of a 1D array of points, identical to mandelbrot(check_period=True):
+    all the orbits start together, their snapshots are taken at the same iterations (1, 3, 7, 15, ...).
+    """
+    counts = np.full(c.shape, max_iter, dtype=np.int64)
+
+    # Active set: index, c, z and snapshot of z of points neither diverged nor cyclic.
+    idx = np.arange(c.size)
+    z, old = np.zeros_like(c), np.zeros_like(c)
+
+    n, snapshot = 0, 1
+    while n < max_iter and idx.size > 0:
+        z = z * z + c
+        n += 1
+
+        diverged = ~(np.abs(z) <= 2)
+        counts[idx[diverged]] = n
+        active = ~(diverged | (np.abs(z - old) < tol))
+        idx, c, z, old = idx[active], c[active], z[active], old[active]
+        if n == snapshot:
+            old, snapshot = z, 2 * snapshot + 1
+
+    return counts
+
+
+def mandelbrot_resume(c, z, start, max_iter=MAX_ITER):
+    """
+    Continue the iterations of f(z)=z^2 + c for points which did not diverge after start iterations.
+    Only the points which have not diverged yet are iterated (compacted active set).
+    :param c: 1D array of complex numbers (points from the grid).
+    :param z: 1D array of the values of z reached after start iterations (zeros for start = 0).
+    :param start: Number of iteration already done.
+    :param max_iter: Maximal number of iteration fixed to consider complex number in mandelbrot set.
+    :return: Integer array of number of iteration until divergence or max_iter, array of last value of z.
+    """
+    if numba_backend.use_numba():
+        return numba_backend.mandelbrot_resume(c, z, start, max_iter)
+
+    counts = np.full(c.shape, max_iter, dtype=np.int64)
+    z_out = np.array(z, dtype=np.complex128)
+
+    # Active set: index, real/imaginary part of c and z for points not diverged yet.
+    idx = np.arange(c.size)
+    cr, ci = c.real.copy(), c.imag.copy()
+    zr, zi = z_out.real.copy(), z_out.imag.copy()
+
+    n = start
+    while n < max_iter and idx.size > 0:
+        # z = z^2 + c, computed as Python complex arithmetic does it (no fused operations).
+        zr, zi = zr * zr - zi * zi + cr, zr * zi + zi * zr + ci
+        n += 1
+
+        diverged = ~(np.hypot(zr, zi) <= 2)
+        if diverged.any():
+            counts[idx[diverged]] = n
+            z_out.real[idx[diverged]], z_out.imag[idx[diverged]] = zr[diverged], zi[diverged]
+            bounded = ~diverged
+            idx, cr, ci, zr, zi = idx[bounded], cr[bounded], ci[bounded], zr[bounded], zi[bounded]
+
+    z_out.real[idx], z_out.imag[idx] = zr, zi
+    return counts, z_out
+
+
+def mandelbrot_detailed(c, max_iter=MAX_ITER, check_period=False, tol=PERIOD_TOL, return_reason=False):
     """
     Estimate if f(z)=z^2 + c diverges with complex number c.
     :param c: Complex number (point from the grid) to use.
     :param max_iter: Maximal number of iteration fixed to consider complex number in mandelbrot set.
+    :param check_period: stop as soon as a cycle of the orbit is detected (see mandelbrot).
+    :param tol: distance under which the orbit is considered to repeat.
+    :param return_reason: also return the termination reason (STOP_ESCAPE, STOP_CYCLE, STOP_MAX_ITER).
     :return: Array of computed z
     """
     z = 0
     n = 0
     fz = [c]
+    old, period, limit = 0, 0, 1
     while abs(z) <= 2 and n < max_iter:
         z = z**2 + c
         fz.append(z)
         n += 1
 
+        if check_period and abs(z) <= 2:
+            if abs(z - old) < tol:
+                return (fz, STOP_CYCLE) if return_reason else fz
+            period += 1
+            if period == limit:
+                old, period, limit = z, 0, 2 * limit
+
+    if return_reason:
+        return fz, STOP_ESCAPE if not abs(z) <= 2 else STOP_MAX_ITER
     return fz
 
 
-def mandelbrot_set(re=(RE_MIN, RE_MAX), im=(IM_MIN, IM_MAX), max_iter=MAX_ITER, w=WIDTH, h=HEIGHT):
+def color_table(max_iter=MAX_ITER):
+    """
+    Lookup table of the palette colours by number of iterations (see get_color).
+    :param max_iter: Maximal number of iteration
+    :return: uint8 array of shape (max_iter + 1, 3), RGB colour of each number of iterations
+    """
+    rgb = np.array([ImageColor.getrgb(color) for color in palette], dtype=np.uint8)
+    idx = [int(round((it / max_iter) * (len(palette) - 1))) for it in range(max_iter + 1)]
+    return rgb[idx]
+
+
+def _grid_rows(re, im, max_iter, w, h, rows, cols):
+    """
+    Number of iterations of a rectangular part (rows, cols) of the grid.
+    Row 0 is the top of the image: the y axis is reverted as the image is drawn from top to bottom.
+    """
+    x = np.arange(cols[0], cols[1])[np.newaxis, :]
+    y = (h - np.arange(rows[0], rows[1]))[:, np.newaxis]
+    c = grid_map_batch(x, y, re, im, w, h)
+    return mandelbrot_batch(c, max_iter)
+
+
+def _init_tile_worker(name, shape):
+    """
+    Pool initializer: attach the worker to the shared memory output buffer.
+    :param name: name of the shared memory block
+    :param shape: shape (h, w) of the grid of iteration counts
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    _shared_grid['shm'] = shm
+    _shared_grid['counts'] = np.ndarray(shape, dtype=np.int64, buffer=shm.buf)
+
+
+def _render_tile(task):
+    """
+    Compute one tile of the grid and write its iteration counts straight into the shared buffer.
+    :param task: tuple (re, im, max_iter, w, h, rows, cols) describing the tile
+    """
+    re, im, max_iter, w, h, rows, cols = task
+    _shared_grid['counts'][rows[0]:rows[1], cols[0]:cols[1]] = _grid_rows(re, im, max_iter, w, h, rows, cols)
+
+
+def mandelbrot_grid_tiled(re=(RE_MIN, RE_MAX), im=(IM_MIN, IM_MAX), max_iter=MAX_ITER, w=WIDTH, h=HEIGHT,
+                          processes=None, tile_size=TILE_SIZE):
+    """
+    Tiled multi-process version of mandelbrot_grid.
+    The grid is split into tiles dispatched one by one to a process pool (dynamic scheduling:
+    tiles inside the set cost far more than tiles outside of it). Workers write the iteration
+    counts into a shared memory array instead of sending results back.
+    :param re: tuple of minimal and maximal coordinates from the real axis
+    :param im: tuple of minimal and maximal coordinates from the imaginary axis
+    :param max_iter: Maximal number of iteration
+    :param w: width of the grid
+    :param h: height of the grid
+    :param processes: number of worker processes (None: number of CPUs)
+    :param tile_size: width and height of a tile in pixels
+    :return: integer array of shape (h, w)
+    """
+    tasks = [(re, im, max_iter, w, h, (r, min(r + tile_size, h)), (c, min(c + tile_size, w)))
+             for r in range(0, h, tile_size) for c in range(0, w, tile_size)]
+
+    shm = shared_memory.SharedMemory(create=True, size=w * h * np.dtype(np.int64).itemsize)
+    try:
+        with Pool(processes, initializer=_init_tile_worker, initargs=(shm.name, (h, w))) as pool:
+            for _ in pool.imap_unordered(_render_tile, tasks, chunksize=1):
+                pass
+        counts = np.ndarray((h, w), dtype=np.int64, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return counts
+
+
+def mandelbrot_grid(re=(RE_MIN, RE_MAX), im=(IM_MIN, IM_MAX), max_iter=MAX_ITER, w=WIDTH, h=HEIGHT):
+    """
+    Number of iterations of every pixel of the grid, computed in one batched pass.
+    Row 0 is the top of the image: the y axis is reverted as the image is drawn from top to bottom.
+    :param re: tuple of minimal and maximal coordinates from the real axis
+    :param im: tuple of minimal and maximal coordinates from the imaginary axis
+    :param max_iter: Maximal number of iteration
+    :param w: width of the grid
+    :param h: height of the grid
+    :return: integer array of shape (h, w)
+    """
+    return _grid_rows(re, im, max_iter, w, h, (0, h), (0, w))
+
+
+def _lattice_tiles(re, im, w, h, tile_size=TILE_SIZE):
+    """
+    Tiles of the lattice of the tile cache covering a grid.
+    At zoom level n, the pixels are the points (px * dx, py * dy) for integers px, py, where (dx, dy) is the
+    pixel size of the default grid divided by ZOOM_FACTOR^n; the tile (tx, ty) holds the pixels
+    tx * tile_size <= px < (tx + 1) * tile_size and ty * tile_size <= py < (ty + 1) * tile_size.
+    :return: tuple (level, px0, py0, x_tiles, y_tiles), None if the pixel size of the grid matches no zoom level
+    """
+    level_x = np.log((RE_MAX - RE_MIN) / WIDTH * w / (re[1] - re[0])) / np.log(ZOOM_FACTOR)
+    level_y = np.log((IM_MAX - IM_MIN) / HEIGHT * h / (im[1] - im[0])) / np.log(ZOOM_FACTOR)
+    level = int(np.round(level_x))
+    if abs(level_x - level) > LEVEL_TOL or abs(level_y - level) > LEVEL_TOL:
+        return None
+
+    # Grid snapped on the lattice: column x is px0 + x, row y is py0 + h - y.
+    dx, dy = _lattice_size(level)
+    px0, py0 = int(np.round(re[0] / dx)), int(np.round(im[0] / dy))
+    x_tiles = range(px0 // tile_size, (px0 + w - 1) // tile_size + 1)
+    y_tiles = range((py0 + 1) // tile_size, (py0 + h) // tile_size + 1)
+    return level, px0, py0, x_tiles, y_tiles
+
+
+def _lattice_size(level):
+    """
+    Pixel size (dx, dy) of the lattice of the tile cache at a zoom level.
+    """
+    scale = float(ZOOM_FACTOR) ** level
+    return (RE_MAX - RE_MIN) / WIDTH / scale, (IM_MAX - IM_MIN) / HEIGHT / scale
+
+
+def _lattice_tile(level, tx, ty, max_iter, tile_size=TILE_SIZE):
+    """
+    Number of iterations of the pixels of a tile of the lattice, row j holding the pixels py = ty * tile_size + j.
+    """
+    dx, dy = _lattice_size(level)
+    c = np.empty((tile_size, tile_size), dtype=np.complex128)
+    c.real = ((tx * tile_size + np.arange(tile_size)) * dx)[np.newaxis, :]
+    c.imag = ((ty * tile_size + np.arange(tile_size)) * dy)[:, np.newaxis]
+    return mandelbrot_batch(c, max_iter)
+
+
+def tiles_cached(re, im, max_iter, w, h, cache, tile_size=TILE_SIZE):
+    """
+    Whether all the tiles covering a grid are in the tile cache.
+    """
+    tiles = _lattice_tiles(re, im, w, h, tile_size)
+    if tiles is None:
+        return False
+    level, _, _, x_tiles, y_tiles = tiles
+    return all((level, (tx, ty), max_iter, tile_size) in cache for ty in y_tiles for tx in x_tiles)
+
+
+def mandelbrot_grid_cached(re=(RE_MIN, RE_MAX), im=(IM_MIN, IM_MAX), max_iter=MAX_ITER, w=WIDTH, h=HEIGHT,
+                           cache=None, tile_size=TILE_SIZE, cancel=None):
+    """
+    Number of iterations of every pixel of the grid, assembled from tiles of the tile cache.
+    The render stops as soon as cancel is set (checked between tiles).
+    The grid is snapped on the lattice of its zoom level (see _lattice_tiles), so that revisited regions and
+    overlapping grids reuse the tiles already computed; missing tiles are computed and cached.
+    Grids whose pixel size matches no zoom level are computed by mandelbrot_grid.
+    :param re: tuple of minimal and maximal coordinates from the real axis
+    :param im: tuple of minimal and maximal coordinates from the imaginary axis
+    :param max_iter: Maximal number of iteration
+    :param w: width of the grid
+    :param h: height of the grid
+    :param cache: TileCache (a new one if None)
+    :param tile_size: width and height of a tile in pixels
+    :param cancel: threading.Event cancelling the render
+    :return: integer array of shape (h, w), None if the render was cancelled
+    """
+    tiles = _lattice_tiles(re, im, w, h, tile_size)
+    if tiles is None:
+        return None if cancel is not None and cancel.is_set() else mandelbrot_grid(re, im, max_iter, w, h)
+    cache = TileCache() if cache is None else cache
+
+    level, px0, py0, x_tiles, y_tiles = tiles
+    counts = np.empty((len(y_tiles) * tile_size, len(x_tiles) * tile_size), dtype=np.int64)
+    for j, ty in enumerate(y_tiles):
+        for i, tx in enumerate(x_tiles):
+            key = (level, (tx, ty), max_iter, tile_size)
+            tile = cache.get(key)
+            if tile is None:
+                if cancel is not None and cancel.is_set():
+                    return None
+                tile = _lattice_tile(level, tx, ty, max_iter, tile_size)
+                cache.put(key, tile)
+            counts[j * tile_size:(j + 1) * tile_size, i * tile_size:(i + 1) * tile_size] = tile
+
+    # Crop the grid, and revert the y axis as the image is drawn from top to bottom.
+    x0, y0 = px0 - x_tiles[0] * tile_size, py0 + 1 - y_tiles[0] * tile_size
+    return counts[y0:y0 + h, x0:x0 + w][::-1]
+
+
+def mandelbrot_set(re=(RE_MIN, RE_MAX), im=(IM_MIN, IM_MAX), max_iter=MAX_ITER, w=WIDTH, h=HEIGHT,
+                   tiled=False, processes=None, tile_size=TILE_SIZE, cache=None):
     """
     Estimate set of complex numbers for which function f(z) = z^2 + c does not diverges.
     :param re: tuple of minimal and maximal coordinates from the real axis
@@ -148,24 +595,252 @@ def mandelbrot_set(re=(RE_MIN, RE_MAX), im=(IM_MIN, IM_MAX), max_iter=MAX_ITER,
     :param max_iter: Maximal number of iteration
     :param w: width of the grid
     :param h: height of the grid
+    :param tiled: render tiles of the grid in a process pool (see mandelbrot_grid_tiled)
+    :param processes: number of worker processes of the tiled mode (None: number of CPUs)
+    :param tile_size: width and height of a tile in pixels, in the tiled mode and for the cache
+    :param cache: TileCache, assemble the grid from cached tiles (see mandelbrot_grid_cached)
     :return: image
     """
+    if cache is not None:
+        counts = mandelbrot_grid_cached(re, im, max_iter, w, h, cache, tile_size)
+    elif tiled:
+        counts = mandelbrot_grid_tiled(re, im, max_iter, w, h, processes, tile_size)
+    else:
+        counts = mandelbrot_grid(re, im, max_iter, w, h)
+
+    # Map number of iterations to the palette, and build the image from the RGB buffer.
+    return Image.fromarray(color_table(max_iter)[counts], "RGB")
+
+
+def mandelbrot_set_progressive(re=(RE_MIN, RE_MAX), im=(IM_MIN, IM_MAX), max_iter=MAX_ITER, w=WIDTH, h=HEIGHT,
+                               passes=PROGRESSIVE_PASSES, cancel=None, cache=None):
+    """
+    Render the Mandelbrot set progressively: a coarse low-resolution pass first, then refinement passes.
+    The pass with a downsampling factor of 1 is the image of mandelbrot_set.
+    Each pass is computed by bands of TILE_SIZE rows, the render stops as soon as cancel is set.
+    :param re: tuple of minimal and maximal coordinates from the real axis
+    :param im: tuple of minimal and maximal coordinates from the imaginary axis
+    :param max_iter: Maximal number of iteration
+    :param w: width of the grid
+    :param h: height of the grid
+    :param passes: downsampling factor of each pass, from the coarsest to the finest
+    :param cancel: threading.Event cancelling the render
+    :param cache: TileCache used by the last pass; the coarse passes are skipped when all its tiles are cached
+    :return: generator of images, one per pass
+    """
+    table = color_table(max_iter)
+    if cache is not None and tiles_cached(re, im, max_iter, w, h, cache):
+        passes = passes[-1:]
+
+    for factor in passes:
+        if cache is not None and factor == 1:
+            counts = mandelbrot_grid_cached(re, im, max_iter, w, h, cache, cancel=cancel)
+            if counts is None or (cancel is not None and cancel.is_set()):
+                return
+            yield Image.fromarray(table[counts], "RGB")
+            continue
+
+        pw, ph = max(1, w // factor), max(1, h // factor)
+        counts = np.empty((ph, pw), dtype=np.int64)
+        for row in range(0, ph, TILE_SIZE):
+            if cancel is not None and cancel.is_set():
+                return
+            rows = (row, min(row + TILE_SIZE, ph))
+            counts[rows[0]:rows[1]] = _grid_rows(re, im, max_iter, pw, ph, rows, (0, pw))
+
+        yield Image.fromarray(table[counts], "RGB")
+
+
+
+def reference_orbit(c, max_iter=MAX_ITER, digits=None):
+    """
+    Orbit of the reference point of the perturbation rendering, computed in high precision (decimal)
+    and rounded to complex numbers. The orbit stops once it diverges.
+    :param c: tuple of the real and imaginary parts of the reference point (Decimal, str or float)
+    :param max_iter: Maximal number of iteration
+    :param digits: number of significant digits of the computation (default: digits of c plus REFERENCE_DIGITS)
+    :return: complex128 array of z_0 = 0, z_1, ..., z_k with k = max_iter or the iteration of divergence
+    """
+    cr, ci = Decimal(c[0]), Decimal(c[1])
+    if digits is None:
+        digits = max(len(cr.as_tuple().digits), len(ci.as_tuple().digits)) + REFERENCE_DIGITS
+
+    orbit = [complex(0, 0)]
+    with localcontext() as ctx:
+        ctx.prec = digits
+        zr, zi = Decimal(0), Decimal(0)
+        for n in range(max_iter):
+            zr, zi = zr * zr - zi * zi + cr, 2 * zr * zi + ci
+            orbit.append(complex(float(zr), float(zi)))
+            if zr * zr + zi * zi > 4:
+                break
+    return np.array(orbit)
+
+
+def deep_max_iter(re, max_iter=MAX_ITER):
+    """
+    Maximal number of iteration of a deep zoom window: points close to the boundary need more iterations to diverge
+    the deeper the zoom, max_iter is raised by DEEP_ITER_PER_DECADE per decade of zoom from the full real axis.
+    :param re: tuple of minimal and maximal coordinates (or offsets) from the real axis
+    :param max_iter: Maximal number of iteration of the full view
+    """
+    decades = np.log10((RE_MAX - RE_MIN) / abs(re[1] - re[0]))
+    return max_iter + int(DEEP_ITER_PER_DECADE * max(0., decades))
 
-    # Create a simple image
-    img = Image.new("RGB", (w, h), (0, 0, 0))
-    draw = ImageDraw.Draw(img)
 
-    # For each pixel of the surface
-    for x in range(0, w):  # Each column
-        for y in range(0, h):  # Each row
-            # Convert point (x, y) to complex coordinates (re, im)
-            c = grid_map(x, y, re, im)
+def mandelbrot_perturbation(dc, orbit, max_iter=MAX_ITER, cancel=None):
+    """
+    Escape-time iteration of the points c = C + dc, given the orbit Z of a reference point C,
+    on the deltas dz = z - Z only: dz_(m+1) = 2 Z_m dz_m + dz_m^2 + dc stays at float64 speed and precision
+    even when dc is far below the resolution of float64 around C.
+    Glitches, where the delta grows larger than the value itself (|Z_m + dz_m| < |dz_m|), and points outliving
+    the reference orbit are rebased on the start of the orbit: dz = Z_m + dz and m = 0 (Z_0 = 0).
+    :param dc: array of complex offsets of the points from the reference point
+    :param orbit: reference orbit, see reference_orbit
+    :param max_iter: Maximal number of iteration
+    :param cancel: threading.Event cancelling the iteration, checked every CANCEL_CHECK iterations
+    :return: Integer array (same shape as dc) of number of iteration until divergence or max_iter,
+        None if cancelled.
+    """
+    dc = np.asarray(dc, dtype=np.complex128)
+    counts = np.full(dc.shape, max_iter, dtype=np.int64)
 
-            # Determine if there's divergence with c.
-            n = mandelbrot(c, max_iter)
-            draw.point([x, h-y], fill=get_color(n))  # Draw from top to bottom, so we must revert y axis.
-    return img
+    # Active set: index, offset, delta and position in the reference orbit of points not diverged yet.
+    idx = np.arange(dc.size)
+    dc_ = dc.ravel()
+    dz = np.zeros(dc.size, dtype=np.complex128)
+    m = np.zeros(dc.size, dtype=np.int64)
 
+    n = 0
+    while n < max_iter and idx.size > 0:
+        if cancel is not None and n % CANCEL_CHECK == 0 and cancel.is_set():
+            return None
+        dz = 2 * orbit[m] * dz + dz * dz + dc_
+        m += 1
+        n += 1
+        z = orbit[m] + dz
+
+        diverged = ~(np.abs(z) <= 2)
+        if diverged.any():
+            counts.flat[idx[diverged]] = n
+            bounded = ~diverged
+            idx, dc_, dz, m, z = idx[bounded], dc_[bounded], dz[bounded], m[bounded], z[bounded]
+
+        rebase = (np.abs(z) < np.abs(dz)) | (m == orbit.size - 1)
+        dz[rebase], m[rebase] = z[rebase], 0
+
+    return counts
+
+
+def mandelbrot_grid_deep(center, re, im, max_iter=MAX_ITER, w=WIDTH, h=HEIGHT, cancel=None):
+    """
+    Number of iterations of every pixel of a deep zoom grid, by perturbation around its center.
+    The window is given by offsets from a high precision center, so that it can be far narrower
+    than the resolution of float64 around the center.
+    :param center: tuple of the real and imaginary parts of the center (Decimal or str)
+    :param re: tuple of minimal and maximal offsets from the center on the real axis
+    :param im: tuple of minimal and maximal offsets from the center on the imaginary axis
+    :param max_iter: Maximal number of iteration
+    :param w: width of the grid
+    :param h: height of the grid
+    :param cancel: threading.Event cancelling the render
+    :return: integer array of shape (h, w), None if the render was cancelled
+    """
+    width = max(abs(re[1] - re[0]), abs(im[1] - im[0]))
+    digits = max(0, int(np.ceil(-np.log10(width)))) + REFERENCE_DIGITS
+    orbit = reference_orbit(center, max_iter, digits)
+
+    x = np.arange(w)[np.newaxis, :]
+    y = (h - np.arange(h))[:, np.newaxis]
+    return mandelbrot_perturbation(grid_map_batch(x, y, re, im, w, h), orbit, max_iter, cancel)
+
+
+def mandelbrot_set_deep(center, re, im, max_iter=MAX_ITER, w=WIDTH, h=HEIGHT, cancel=None):
+    """
+    Image of a deep zoom into the Mandelbrot set, see mandelbrot_grid_deep.
+    :param center: tuple of the real and imaginary parts of the center (Decimal or str)
+    :param re: tuple of minimal and maximal offsets from the center on the real axis
+    :param im: tuple of minimal and maximal offsets from the center on the imaginary axis
+    :param max_iter: Maximal number of iteration
+    :param w: width of the grid
+    :param h: height of the grid
+    :param cancel: threading.Event cancelling the render
+    :return: image, None if the render was cancelled
+    """
+    counts = mandelbrot_grid_deep(center, re, im, max_iter, w, h, cancel)
+    if counts is None:
+        return None
+    return Image.fromarray(color_table(max_iter)[counts], "RGB")
+
+
+def _edge_lattice(cx, cy, edge_points):
+    """
+    Lattice coordinates of the points on the edges of quadtree cells, corners included:
+    cell (cx, cy) spans [cx * edge_points, (cx + 1) * edge_points] on both axes of the lattice.
+    :return: integer arrays of shape (cells, 4 * edge_points)
+    """
+    t = np.arange(edge_points)
+    x0, y0 = cx[:, None] * edge_points, cy[:, None] * edge_points
+    x = np.concatenate([x0 + t, x0 + edge_points + 0 * t, x0 + edge_points - t, x0 + 0 * t], axis=1)
+    y = np.concatenate([y0 + 0 * t, y0 + t, y0 + edge_points + 0 * t, y0 + edge_points - t], axis=1)
+    return x, y
+
+
+def mandelbrot_area_bounds(re=(RE_MIN, RE_MAX), im=(IM_MIN, IM_MAX), max_iter=MAX_ITER, depth=QUADTREE_DEPTH,
+                           edge_points=EDGE_POINTS):
+    """
+    Deterministic lower and upper bounds of the area of the Mandelbrot set by quadtree refinement.
+    Points on the edges of each cell are tested with the escape-time kernel (with the cardioid/bulb tests and
+    periodicity checking).
+    The set is connected and has no hole, so a cell whose boundary lies in the set is fully inside,
+    and a cell whose boundary lies outside the set is fully outside (unless it contains the whole set,
+    i.e. the point 0). Only the other cells, on the boundary of the set, are divided into 4 cells.
+    The edge points lie on an integer lattice of the finest level: each point is computed once, the corners
+    and edges shared by neighbouring cells, and the points of a parent reused by its children.
+    The bounds hold up to the resolution of the edges and of max_iter.
+    :param re: tuple of minimal and maximal coordinates from the real axis
+    :param im: tuple of minimal and maximal coordinates from the imaginary axis
+    :param max_iter: Maximal number of iteration
+    :param depth: Number of refinements of boundary cells
+    :param edge_points: Number of points tested per edge of a cell
+    :return: lower bound (area of inside cells) and upper bound (adding area of boundary cells)
+    """
+    size = edge_points << depth  # Lattice intervals per axis at the finest level
+    keys, known = np.empty(0, dtype=np.int64), np.empty(0, dtype=bool)  # Sorted lattice points computed so far
+    cx, cy = np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64)
+    inside = 0
+
+    for level in range(depth + 1):
+        cells = 1 << level
+        dx, dy = (re[1] - re[0]) / cells, (im[1] - im[0]) / cells
+        x, y = _edge_lattice(cx, cy, edge_points)
+        scale = 1 << (depth - level)
+        point = (x * scale) * (size + 1) + y * scale
+
+        # Only the points missing from the previous levels and from the neighbouring cells are computed.
+        new = np.unique(point)
+        new = new[~np.isin(new, keys, assume_unique=True)]
+        c = np.empty(new.size, dtype=np.complex128)
+        c.real = re[0] + (new // (size + 1)) * ((re[1] - re[0]) / size)
+        c.imag = im[0] + (new % (size + 1)) * ((im[1] - im[0]) / size)
+        keys = np.concatenate([keys, new])
+        known = np.concatenate([known, mandelbrot_batch(c, max_iter, check_bulbs=True, check_period=True) == max_iter])
+        order = np.argsort(keys, kind='stable')
+        keys, known = keys[order], known[order]
+        in_set = known[np.searchsorted(keys, point)]
+
+        all_in = in_set.all(axis=1)
+        x0, y0 = re[0] + cx * dx, im[0] + cy * dy
+        contains_set = (x0 <= 0) & (0 <= x0 + dx) & (y0 <= 0) & (0 <= y0 + dy)
+        boundary = ~all_in & (in_set.any(axis=1) | contains_set)
+        inside += np.count_nonzero(all_in) * dx * dy
+
+        cx, cy = cx[boundary], cy[boundary]
+        if level < depth:
+            cx = np.concatenate([2 * cx, 2 * cx + 1, 2 * cx, 2 * cx + 1])
+            cy = np.concatenate([2 * cy, 2 * cy, 2 * cy + 1, 2 * cy + 1])
+
+    return inside, inside + cx.size * dx * dy
 
 if __name__ == '__main__':
     img = mandelbrot_set()
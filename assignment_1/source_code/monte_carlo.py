@@ -1,11 +1,17 @@
 import numpy as np
 import time
+import inspect
+from functools import partial
 import mandelbrot
 
 from sampling_method import pure_random, latin_square_chaos
 
+BATCH_SIZE = 100000  # Number of samples drawn at once by the streaming estimator
+STRATA = (8, 8)  # Number of cells along the real and imaginary axis for stratified sampling
+PILOT = 0.2  # Fraction of the samples used by the pilot pass of stratified sampling
 
-def monte_carlo_integration(re, im, w, h, s, i, sampling_method=pure_random):
+
+def monte_carlo_integration(re, im, w, h, s, i, sampling_method=pure_random, check_bulbs=False, cache=None, seed=None, rng=None):
 	"""
 	Monte-carlo integration algorithm.
 	Estimates the surface value of a complex plan.
@@ -16,7 +22,11 @@ def monte_carlo_integration(re, im, w, h, s, i, sampling_method=pure_random):
 	:param s: Maximal number of samples
 	:param i: Number of iteration
 	:param sampling_method: sampling method used (pure random, halton sequence, etc.)
-	:return: Array of estimation of the surface in complex units.
+	:param check_bulbs: skip the iterations of samples in the main cardioid or the period-2 bulb (counted as i)
+	:param cache: IterationCache, reuse iterations of previous runs on the same samples (e.g. with a lower i)
+	:param seed: seed of the random generator used to draw samples when rng is not given (also part of the cache key)
+	:param rng: numpy.random.Generator used by the sampling method
+	:return: Estimation of the surface in complex units, array of complex samples, array of number of iteration per sample.
 	"""
 	# Get real and imaginary minimal and maximal axis coordinates.
 	re_min, re_max = re[0], re[1]
@@ -27,20 +37,25 @@ def monte_carlo_integration(re, im, w, h, s, i, sampling_method=pure_random):
 	# Choose n random grid points to sample
 	n, count = s, 0
 
+	if rng is None:
+		rng = np.random.default_rng(seed)
+
 	# choose sampling method based on kwarg
-	x_samp, y_samp = sampling_method(w, h, n)
+	x_samp, y_samp = sampling_method(w, h, n, rng)
 
 	# Running time
 	start_time = time.time()
 
 	# Convert euclidian coordinates sample to complex
-	samples = list(map(lambda x, y: mandelbrot.grid_map(x, y, (re_min, re_max), (im_min, im_max)), x_samp, y_samp))
+	samples = mandelbrot.grid_map_batch(x_samp, y_samp, (re_min, re_max), (im_min, im_max))
 
 	details = np.zeros(s)  # Keep track of number of iterations per sample
-	for idx, c in enumerate(samples):
-		res = mandelbrot.mandelbrot(c, i)
-		count += int(res == i)
-		details[idx] = res  # Store number of iteration reach for each complex number
+	if cache is None:
+		res = mandelbrot.mandelbrot_batch(samples, i, check_bulbs)
+	else:
+		res = cache.counts(samples, i, seed, check_bulbs)
+	count = int(np.sum(res == i))
+	details[:res.size] = res  # Store number of iteration reach for each complex number
 
 	# Proportion of sample points within the set scaled to size of complex plane
 	estimate = (count / s) * a
@@ -51,6 +66,190 @@ def monte_carlo_integration(re, im, w, h, s, i, sampling_method=pure_random):
 	return estimate, samples, details
 
 
+def area_by_iteration(details, i, a):
+	"""
+	Estimation of the surface A_js for every maximal number of iteration j = 0, ..., i,
+	from the number of iteration reached by each sample (samples with details >= j are in the set).
+	Counts are the reverse cumulative sum of the histogram of details: O(s + i) instead of O(s * i).
+	:param details: array (..., s) of number of iteration per sample, for i iterations
+	:param i: Number of iteration
+	:param a: Area of the complex plane
+	:return: array (..., i + 1) of estimations of the surface
+	"""
+	details = np.asarray(details)
+	s = details.shape[-1]
+	rows = details.reshape(-1, s).astype(np.int64)
+
+	# Histogram of each row with a single bincount, rows shifted by (i + 1).
+	offsets = np.arange(rows.shape[0])[:, np.newaxis] * (i + 1)
+	hist = np.bincount((rows + offsets).ravel(), minlength=rows.shape[0] * (i + 1)).reshape(-1, i + 1)
+	counts = np.cumsum(hist[:, ::-1], axis=1)[:, ::-1]
+
+	return ((counts / s) * a).reshape(details.shape[:-1] + (i + 1,))
+
+
+def area_by_sampling(details, i, a):
+	"""
+	Estimation of the surface A_it for every number of samples t = 1, ..., s,
+	from the number of iteration reached by each sample (samples with details == i are in the set).
+	Counts are the cumulative sum of the in-set indicator: O(s) instead of O(s^2).
+	As in the original loop, the count for t samples covers the samples 0, ..., t (details[:t + 1]).
+	:param details: array (..., s) of number of iteration per sample, for i iterations
+	:param i: Number of iteration
+	:param a: Area of the complex plane
+	:return: array (..., s) of estimations of the surface
+	"""
+	details = np.asarray(details)
+	s = details.shape[-1]
+	t = np.arange(1, s + 1)
+	counts = np.cumsum(details == i, axis=-1)[..., np.minimum(t, s - 1)]
+	return (counts / t) * a
+
+
+def sequence_skip(sampling_method):
+	"""
+	Index of the first point of a low-discrepancy sequence sampler (halton_sequence, scrambled_sobol, etc.),
+	i.e. the default of its skip keyword. Each call of such a sampler restarts the sequence at that index,
+	so successive draws must advance skip to get new points.
+	:param sampling_method: sampling method
+	:return: default skip of the sampler, None for samplers without a sequence index (pure random, latin hypercube, etc.)
+	"""
+	parameter = inspect.signature(sampling_method).parameters.get('skip')
+	return None if parameter is None else parameter.default
+
+
+def sample_batches(w, h, s, sampling_method=pure_random, batch_size=BATCH_SIZE, rng=None):
+	"""
+	Generator of batches of samples drawn from a sampling method, s samples in total.
+	Stratified methods (latin hypercube, orthogonal) are stratified within each batch.
+	Sequence samplers (see sequence_skip) continue the sequence: each batch starts where the previous one stopped.
+	:param w: width of the plan
+	:param h: height of the plan
+	:param s: Total number of samples
+	:param sampling_method: sampling method used (pure random, halton sequence, etc.)
+	:param batch_size: Maximal number of samples per batch
+	:param rng: numpy.random.Generator used by the sampling method
+	:return: iterator of (x, y) arrays of euclidian coordinates
+	"""
+	rng = np.random.default_rng() if rng is None else rng
+	skip = sequence_skip(sampling_method)
+	drawn = 0
+	while drawn < s:
+		n = min(batch_size, s - drawn)
+		if skip is None:
+			x_samp, y_samp = sampling_method(w, h, n, rng)
+		else:
+			x_samp, y_samp = sampling_method(w, h, n, rng, skip=skip + drawn)
+		drawn += n
+		yield np.asarray(x_samp), np.asarray(y_samp)
+
+
+def monte_carlo_streaming(re, im, w, h, s, i, sampling_method=pure_random, batch_size=BATCH_SIZE, keep_details=False, check_bulbs=False, rng=None):
+	"""
+	Streaming monte-carlo integration algorithm, with constant memory.
+	Samples are drawn by batches and the number of samples in the set is updated incrementally.
+	:param re: tuple of minimal and maximal coordinates of real axis
+	:param im: tuple of minimal and maximal coordinates of imaginary axis.
+	:param w: width of the plan
+	:param h: height of the plan
+	:param s: Number of samples
+	:param i: Number of iteration
+	:param sampling_method: sampling method used (pure random, halton sequence, etc.)
+	:param batch_size: Maximal number of samples per batch
+	:param keep_details: keep the number of iteration of each sample (memory grows with s)
+	:param check_bulbs: skip the iterations of samples in the main cardioid or the period-2 bulb (counted as i)
+	:param rng: numpy.random.Generator used by the sampling method
+	:return: Estimation of the surface in complex units, array of number of iteration per sample (None if not kept).
+	"""
+	# Area of the complex plane
+	a = (re[1] - re[0]) * (im[1] - im[0])
+
+	count, offset = 0, 0
+	details = np.zeros(s) if keep_details else None
+	for x_samp, y_samp in sample_batches(w, h, s, sampling_method, batch_size, rng):
+		samples = mandelbrot.grid_map_batch(x_samp, y_samp, re, im)
+		res = mandelbrot.mandelbrot_batch(samples, i, check_bulbs)
+		count += int(np.sum(res == i))
+
+		if keep_details:
+			details[offset:offset + res.size] = res
+		offset += min(batch_size, s - offset)
+
+	# Proportion of sample points within the set scaled to size of complex plane
+	estimate = (count / s) * a
+
+	return estimate, details
+
+
+def monte_carlo_stratified(re, im, w, h, s, i, sampling_method=pure_random, strata=STRATA, pilot=PILOT, check_bulbs=False, rng=None):
+	"""
+	Adaptive stratified monte-carlo integration (Neyman allocation).
+	The complex plane is partitioned into cells. A pilot pass draws the same number of samples in every cell,
+	then the remaining samples are allocated in proportion to the estimated standard deviation sqrt(p(1 - p))
+	of the in-set indicator of each cell: cells deep inside or far outside the set get few samples.
+	The confidence interval is confidence_interval_ppf(estimate, sqrt(variance), alpha, 1).
+	The variance p(1 - p) / (n - 1) of each cell assumes independent samples within the cell (pure_random):
+	with stratified or quasi-random samplers (latin hypercube, orthogonal, halton, ...) the estimate remains
+	valid but the returned variance, and so the confidence interval, is not.
+	:param re: tuple of minimal and maximal coordinates of real axis
+	:param im: tuple of minimal and maximal coordinates of imaginary axis.
+	:param w: width of the plan
+	:param h: height of the plan
+	:param s: Total number of samples, at least 2 per cell
+	:param i: Number of iteration
+	:param sampling_method: sampling method used in each cell (pure random, halton sequence, etc.),
+		sequence samplers continue their sequence in each cell from the pilot pass to the second pass
+	:param strata: number of cells along the real and imaginary axis
+	:param pilot: fraction of the s samples used by the pilot pass
+	:param check_bulbs: skip the iterations of samples in the main cardioid or the period-2 bulb (counted as i)
+	:param rng: numpy.random.Generator used by the sampling method
+	:return: Estimation of the surface in complex units, variance of the estimation, number of samples per cell.
+	"""
+	rng = np.random.default_rng() if rng is None else rng
+	nx, ny = strata
+	if s < 2 * nx * ny:
+		raise ValueError("Stratified sampling needs at least 2 samples per cell, {0} < 2 x {1} x {2}".format(s, nx, ny))
+	re_edges = np.linspace(re[0], re[1], nx + 1)
+	im_edges = np.linspace(im[0], im[1], ny + 1)
+	a_cell = (re[1] - re[0]) * (im[1] - im[0]) / (nx * ny)
+
+	count = np.zeros((nx, ny))
+	n = np.zeros((nx, ny), dtype=int)
+	skip = sequence_skip(sampling_method)
+
+	def sample_cells(allocation):
+		for (x, y), m in np.ndenumerate(allocation):
+			if m > 0:
+				cell_re, cell_im = (re_edges[x], re_edges[x + 1]), (im_edges[y], im_edges[y + 1])
+				# Sequence samplers continue, in the second pass, the sequence of the cell drawn by the pilot pass.
+				method = sampling_method if skip is None else partial(sampling_method, skip=skip + int(n[x, y]))
+				_, _, details = monte_carlo_integration(cell_re, cell_im, w, h, m, i, method, check_bulbs, rng=rng)
+				count[x, y] += np.sum(details == i)
+				n[x, y] += m
+
+	# Pilot pass: same number of samples in every cell (at least 2 to estimate a variance, within the s samples).
+	sample_cells(np.full((nx, ny), max(2, int(pilot * s) // (nx * ny))))
+
+	# Neyman allocation of the remaining samples. The proportion is smoothed so that no cell gets
+	# a zero standard deviation only because the pilot pass missed the boundary of the set.
+	remaining = s - n.sum()
+	if remaining > 0:
+		p = (count + 0.5) / (n + 1)
+		sigma = np.sqrt(p * (1 - p))
+		share = remaining * sigma / sigma.sum()
+		allocation = np.floor(share).astype(int)
+		leftover = remaining - allocation.sum()
+		allocation.flat[np.argsort(allocation - share, axis=None)[:leftover]] += 1
+		sample_cells(allocation)
+
+	# Combine cell estimates: sum of the areas in each cell, and variance of the Bernoulli means.
+	p = count / n
+	estimate = a_cell * np.sum(p)
+	variance = a_cell**2 * np.sum(p * (1 - p) / (n - 1))
+
+	return estimate, variance, n
+
+
 if __name__ == '__main__':
 	monte_carlo_integration(
 		re=(mandelbrot.RE_MIN, mandelbrot.RE_MAX),
@@ -0,0 +1,133 @@
+import os
+import math
+import numpy as np
+
+try:
+    import numba
+    NUMBA_AVAILABLE = True
+except ImportError:
+    numba = None
+    NUMBA_AVAILABLE = False
+
+BACKENDS = ('numpy', 'numba')
+
+# Backend of the escape-time kernels and of the orthogonal sampler, auto-selected (numba when it imports)
+# unless forced by the MANDELBROT_BACKEND environment variable or set_backend.
+_backend = {'name': None}
+
+
+def set_backend(name=None):
+    """
+    Select the backend of the escape-time kernels and of the orthogonal sampler.
+    Both backends give identical results.
+    :param name: 'numpy', 'numba', or None for numba when it is installed, numpy otherwise
+    """
+    if name is None:
+        name = 'numba' if NUMBA_AVAILABLE else 'numpy'
+    if name not in BACKENDS:
+        raise ValueError("Unknown backend {0}, expected one of {1}".format(name, BACKENDS))
+    if name == 'numba' and not NUMBA_AVAILABLE:
+        raise ImportError("The numba backend requires numba to be installed")
+    _backend['name'] = name
+
+
+def get_backend():
+    """
+    Name of the selected backend, 'numpy' or 'numba'.
+    """
+    return _backend['name']
+
+
+def use_numba():
+    """
+    Whether the numba backend is selected.
+    """
+    return _backend['name'] == 'numba'
+
+
+def _jit(parallel=False):
+    """
+    Compile a kernel with numba when it is installed. Kernels are plain Python otherwise
+    (numba.prange is then range), which keeps them importable and testable.
+    """
+    if not NUMBA_AVAILABLE:
+        return lambda function: function
+    return numba.njit(cache=True, parallel=parallel)
+
+
+prange = numba.prange if NUMBA_AVAILABLE else range
+
+
+def _escape_time(cr, ci, zr, zi, start, max_iter):
+    """
+    Iterations of f(z)=z^2 + c for one point which did not diverge after start iterations.
+    z^2 + c is computed as Python complex arithmetic does it, and |z| with hypot as abs(complex),
+    so that the results are identical to mandelbrot and mandelbrot_resume.
+    :return: number of iteration until divergence or max_iter, real and imaginary parts of the last z
+    """
+    n = start
+    while n < max_iter:
+        zr, zi = zr * zr - zi * zi + cr, zr * zi + zi * zr + ci
+        n += 1
+        if not math.hypot(zr, zi) <= 2:
+            break
+    return n, zr, zi
+
+
+escape_time = _jit()(_escape_time)
+
+
+def _escape_time_batch(cr, ci, zr, zi, start, max_iter, counts, zr_out, zi_out):
+    """
+    Escape-time kernel of an array of points, written into counts, zr_out, zi_out.
+    """
+    for k in prange(cr.size):
+        n, zr_k, zi_k = escape_time(cr[k], ci[k], zr[k], zi[k], start, max_iter)
+        counts[k], zr_out[k], zi_out[k] = n, zr_k, zi_k
+
+
+escape_time_batch = _jit()(_escape_time_batch)
+escape_time_parallel = _jit(parallel=True)(_escape_time_batch)
+
+
+def mandelbrot_resume(c, z, start, max_iter, parallel=True):
+    """
+    Numba version of mandelbrot.mandelbrot_resume.
+    :param c: 1D array of complex numbers (points from the grid).
+    :param z: 1D array of the values of z reached after start iterations (zeros for start = 0).
+    :param start: Number of iteration already done.
+    :param max_iter: Maximal number of iteration fixed to consider complex number in mandelbrot set.
+    :param parallel: run the points in parallel threads (prange)
+    :return: Integer array of number of iteration until divergence or max_iter, array of last value of z.
+    """
+    c = np.asarray(c, dtype=np.complex128)
+    z = np.asarray(z, dtype=np.complex128)
+    counts = np.empty(c.size, dtype=np.int64)
+    zr, zi = np.empty(c.size), np.empty(c.size)
+
+    kernel = escape_time_parallel if parallel else escape_time_batch
+    kernel(np.ascontiguousarray(c.real), np.ascontiguousarray(c.imag), np.ascontiguousarray(z.real),
+           np.ascontiguousarray(z.imag), start, max_iter, counts, zr, zi)
+    z_out = np.empty(c.size, dtype=np.complex128)
+    z_out.real, z_out.imag = zr, zi
+    return counts, z_out
+
+
+def _orthogonal_points(xlist, ylist, ux, uy, w, h, x_samples, y_samples):
+    """
+    Coordinates of the samples of orthogonal sampling, see sampling_method.orthogonal_native:
+    subsquare (i, j) of run r has its sample in minor column xlist[r, i, j] and minor row ylist[r, j, i].
+    """
+    runs, major = xlist.shape[0], xlist.shape[1]
+    samples = major * major
+    for r in prange(runs):
+        for i in range(major):
+            for j in range(major):
+                x_samples[r, i, j] = (w / samples) * (xlist[r, i, j] + ux[r, i, j])
+                y_samples[r, i, j] = (h / samples) * (ylist[r, j, i] + uy[r, i, j])
+
+
+orthogonal_points = _jit(parallel=True)(_orthogonal_points)
+
+
+set_backend(os.environ.get('MANDELBROT_BACKEND'))
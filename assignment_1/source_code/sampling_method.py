@@ -1,70 +1,193 @@
 import numpy as np
-import chaospy
-from subprocess import Popen, PIPE
+import numba_backend
 
+PRIMES = (2, 3, 5, 7, 11, 13)  # Bases of the Halton sequence, one per dimension
+HALTON_SKIP = 4  # First index of the Halton sequence (as chaospy: burn-in of max(primes) + 1 for 2 dimensions)
+SOBOL_BITS = 32  # Number of bits of the Sobol sequence points
 
-def latin_square_chaos(w, h, n):
-    samples = chaospy.create_latin_hypercube_samples(order=n, dim=2).round(4)
+# Sobol direction numbers (Joe & Kuo): degree s, coefficients a and initial m_k of the primitive polynomials
+# of dimensions 2, 3, ... The first dimension is the van der Corput sequence in base 2.
+SOBOL_POLYNOMIALS = ((1, 0, (1,)), (2, 1, (1, 3)), (3, 1, (1, 3, 1)), (3, 2, (1, 1, 1)), (4, 1, (1, 1, 3, 3)))
+
+
+def latin_hypercube(n, dim=2, rng=None):
+    """
+    Latin hypercube samples in the unit hypercube: each of the n rows/columns holds exactly one sample.
+    :param n: number of samples
+    :param dim: number of dimensions
+    :param rng: numpy.random.Generator
+    :return: array of shape (dim, n)
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    perms = rng.permuted(np.broadcast_to(np.arange(n), (dim, n)), axis=1)
+    return (perms + rng.random((dim, n))) / n
+
+
+def radical_inverse(idx, base, permutations=None):
+    """
+    Radical inverse (van der Corput sequence) of an array of integers: reverse their digits in base.
+    :param idx: array of non-negative integers
+    :param base: base of the digits
+    :param permutations: array of shape (ndigits, base), permutation of the digits at each position (scrambling)
+    :return: array of floats in [0, 1)
+    """
+    idx = np.array(idx, dtype=np.int64)
+    out = np.zeros(idx.shape)
+    denominator = float(base)
+    ndigits = 0 if permutations is None else len(permutations)
+    d = 0
+    while d < ndigits or np.any(idx > 0):
+        digit = idx % base
+        if d < ndigits:
+            digit = permutations[d][digit]
+        out += digit / denominator
+        idx //= base
+        denominator *= base
+        d += 1
+    return out
+
+
+def halton(n, dim=2, skip=HALTON_SKIP, scramble=False, rng=None):
+    """
+    Halton sequence in the unit hypercube: radical inverse of the indices skip, ..., skip + n - 1
+    in the first prime bases. Parallel workers take disjoint segments with different skip.
+    :param n: number of samples
+    :param dim: number of dimensions
+    :param skip: index of the first sample
+    :param scramble: apply a random permutation of the digits at each digit position (digit scrambling)
+    :param rng: numpy.random.Generator used for scrambling
+    :return: array of shape (dim, n)
+    """
+    idx = np.arange(skip, skip + n)
+    out = np.empty((dim, n))
+    for d, base in enumerate(PRIMES[:dim]):
+        permutations = None
+        if scramble:
+            rng = np.random.default_rng() if rng is None else rng
+            ndigits = int(np.ceil(53 * np.log(2) / np.log(base)))  # Digits up to float64 resolution
+            permutations = rng.permuted(np.broadcast_to(np.arange(base), (ndigits, base)), axis=1)
+        out[d] = radical_inverse(idx, base, permutations)
+    return out
+
+
+def sobol_directions(dim):
+    """
+    Direction numbers of the Sobol sequence.
+    :param dim: number of dimensions
+    :return: uint64 array of shape (dim, SOBOL_BITS)
+    """
+    v = np.zeros((dim, SOBOL_BITS), dtype=np.uint64)
+    v[0] = [1 << (SOBOL_BITS - 1 - k) for k in range(SOBOL_BITS)]
+    for d, (degree, a, m_init) in enumerate(SOBOL_POLYNOMIALS[:dim - 1], start=1):
+        m = list(m_init)
+        for k in range(degree, SOBOL_BITS):
+            value = m[k - degree] ^ (m[k - degree] << degree)
+            for j in range(1, degree):
+                if (a >> (degree - 1 - j)) & 1:
+                    value ^= m[k - j] << j
+            m.append(value)
+        v[d] = [m[k] << (SOBOL_BITS - 1 - k) for k in range(SOBOL_BITS)]
+    return v
+
+
+def sobol(n, dim=2, skip=0, scramble=False, rng=None):
+    """
+    Sobol sequence in the unit hypercube (Gray code order). Point k is the XOR of the direction numbers
+    selected by the bits of the Gray code of k, so any segment skip, ..., skip + n - 1 is computed directly.
+    :param n: number of samples
+    :param dim: number of dimensions (up to len(SOBOL_POLYNOMIALS) + 1)
+    :param skip: index of the first sample
+    :param scramble: apply a random digital shift (XOR) to each dimension
+    :param rng: numpy.random.Generator used for scrambling
+    :return: array of shape (dim, n)
+    """
+    v = sobol_directions(dim)
+    idx = np.arange(skip, skip + n, dtype=np.uint64)
+    gray = idx ^ (idx >> np.uint64(1))
+
+    points = np.zeros((dim, n), dtype=np.uint64)
+    for k in range(SOBOL_BITS):
+        bit = ((gray >> np.uint64(k)) & np.uint64(1)).astype(bool)
+        points[:, bit] ^= v[:, k:k + 1]
+
+    if scramble:
+        rng = np.random.default_rng() if rng is None else rng
+        points ^= rng.integers(0, 1 << SOBOL_BITS, size=(dim, 1), dtype=np.uint64)
+    return points / float(1 << SOBOL_BITS)
+
+
+def latin_square_chaos(w, h, n, rng=None):
+    # Same construction as chaospy.create_latin_hypercube_samples, drawn from rng
+    samples = latin_hypercube(n, 2, rng).round(4)
     return samples[0] * w, samples[1] * h  
 
 
 # as per randomised quasi-monte carlo 
-def halton_sequence(w, h, n):
-    distribution = chaospy.J(chaospy.Uniform(0, w), chaospy.Uniform(0, h))
-    samples = distribution.sample(n, rule="halton")
-    x_samples = samples[0] + np.random.uniform(0, 1, n) 
-    y_samples = samples[1] + np.random.uniform(0, 1, n)
+def halton_sequence(w, h, n, rng=None, skip=HALTON_SKIP):
+    rng = np.random.default_rng() if rng is None else rng
+    samples = halton(n, 2, skip)
+    x_samples = samples[0] * w + rng.uniform(0, 1, n) 
+    y_samples = samples[1] * h + rng.uniform(0, 1, n)
 
     return np.clip(x_samples, 0, w), np.clip(y_samples, 0, h)
 
 
-def orthogonal_native(w, h, n):
-    MAJOR = 5
-    SAMPLES = MAJOR **2
-    RUNS = int(n / SAMPLES) 
+def scrambled_halton(w, h, n, rng=None, skip=HALTON_SKIP):
+    """
+    Randomised quasi-monte carlo: Halton sequence with random digit scrambling.
+    """
+    samples = halton(n, 2, skip, scramble=True, rng=rng)
+    return samples[0] * w, samples[1] * h
+
 
-    xlist = np.zeros((MAJOR, MAJOR))
-    ylist = np.zeros((MAJOR, MAJOR))
-    x_scale = w / SAMPLES
-    y_scale = h / SAMPLES
+def scrambled_sobol(w, h, n, rng=None, skip=0):
+    """
+    Randomised quasi-monte carlo: Sobol sequence with a random digital shift.
+    """
+    samples = sobol(n, 2, skip, scramble=True, rng=rng)
+    return samples[0] * w, samples[1] * h
 
-    i = 0 
-    j = 0
-    k = 0 
-    m = 0 
-    x = 0
-    y = 0
-    m = 0
 
-    x_samples = []
-    y_samples = []
+def orthogonal_native(w, h, n, rng=None, major=5):
+    """
+    Orthogonal sampling. The plan is divided into major x major subsquares, themselves divided into
+    major x major cells: each subsquare holds one sample, and within each major row/column every minor
+    row/column holds a single sample. Runs of major^2 samples are generated at once until n samples.
+    :param w: width of the plan
+    :param h: height of the plan
+    :param n: number of samples
+    :param rng: numpy.random.Generator
+    :param major: number of subsquares per axis
+    :return: arrays of x and y coordinates of exactly n samples
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    samples = major ** 2
+    runs = -(-n // samples)
 
-    for i, val in enumerate(range(0, MAJOR)):
-        for j, val in enumerate(range(0, MAJOR)):
-            m += 1
-            xlist[i][j] = m
-            ylist[i][j] = m 
+    # Minor columns (rows) of each major column (row), permuted independently for each run
+    cells = np.broadcast_to(np.arange(samples).reshape(major, major), (runs, major, major))
+    xlist = rng.permuted(cells, axis=2)
+    ylist = rng.permuted(cells, axis=2)
 
-    for k, val in enumerate(range(0, RUNS)):
-        for i, val in enumerate(range(0, MAJOR)):
-            np.random.shuffle(xlist[i])
-            np.random.shuffle(ylist[i])
-        for i, val in enumerate(range(0, MAJOR)):
-            for j, val in enumerate(range(0, MAJOR)): 
-                x = x_scale * (xlist[i][j] + np.random.uniform(0, 0.6))
-                y = y_scale * (ylist[j][i] + np.random.uniform(0, 0.6))
-                x_samples.append(x)
-                y_samples.append(y)
+    # Subsquare (i, j) has its sample in minor column xlist[i][j] and minor row ylist[j][i]
+    ux, uy = rng.random((runs, major, major)), rng.random((runs, major, major))
+    if numba_backend.use_numba():
+        x_samples, y_samples = np.empty((runs, major, major)), np.empty((runs, major, major))
+        numba_backend.orthogonal_points(xlist, ylist, ux, uy, w, h, x_samples, y_samples)
+    else:
+        x_samples = (w / samples) * (xlist + ux)
+        y_samples = (h / samples) * (ylist.transpose(0, 2, 1) + uy)
 
-    return x_samples, y_samples
+    return x_samples.ravel()[:n], y_samples.ravel()[:n]
 
 
-def pure_random(w, h, n):
-    return np.random.uniform(0, w, n), np.random.uniform(0, h, n)
+def pure_random(w, h, n, rng=None):
+    rng = np.random.default_rng() if rng is None else rng
+    return rng.uniform(0, w, n), rng.uniform(0, h, n)
 
 
 # === Draft code not used ===
-def latin_square_custom(w, h, n):
+def latin_square_custom(w, h, n, rng=None):
     """
     Use Latin square from ChaosPy instead.
     Performance is not good at the moment...
@@ -74,6 +197,8 @@ def latin_square_custom(w, h, n):
     x_chunks = np.linspace(0, w, num=n)
     y_chunks = np.linspace(0, h, num=n)
 
+    rng = np.random.default_rng() if rng is None else rng
+
     # storing our results
     x_samples = np.zeros(n)
     y_samples = np.zeros(n)
@@ -99,9 +224,9 @@ def latin_square_custom(w, h, n):
         track = False
         while(track != True):
             # generate an x value in the current chunk
-            x_val = np.random.uniform(x_chunks[j], x_chunks[j + 1])
+            x_val = rng.uniform(x_chunks[j], x_chunks[j + 1])
             # now take a sample from entire range of h
-            y_val = np.random.uniform(0, h)
+            y_val = rng.uniform(0, h)
             # get y chunk index in which the value falls
             y_ind = np.where(y_chunks == np.max(y_chunks[y_chunks < y_val]))
             # check if a value has already been generated for this row
@@ -116,18 +241,25 @@ def latin_square_custom(w, h, n):
     return (x_samples, y_samples)
 
 
-def orthogonal(w, h, n):
+def orthogonal(w, h, n, rng=None):
     """
-    Use orthogonal sampling python implementation instead.
-    orthogonal sampling for fixed w, h, n
-    sampling properties are set in the compiled c file. Yet to
-    figure out how to pass arguments, this is the next step ..
+    In-process version of the orthogonal sampling of ortho-pack/ortho-sampling.c (one run of MAJOR^2 samples),
+    for any w, h, n: the number of subsquares per axis is the smallest major with major^2 >= n.
+    A perfect square n gives one complete run, as the compiled program does with n = MAJOR^2.
+    Otherwise the major^2 - n (< 2 major) subsquares left empty lie on two shifted diagonals: every major row
+    and column keeps at least major - 2 samples, in distinct minor rows and columns, instead of the last
+    major row losing most of its samples.
+    :param w: width of the plan
+    :param h: height of the plan
+    :param n: number of samples
+    :param rng: numpy.random.Generator
+    :return: arrays of x and y coordinates of n samples
     """
-    x_samples = []
-    y_samples = []
-    with Popen(['./ortho'], stdout=PIPE, bufsize=1, universal_newlines=True) as p:
-        for line in p.stdout:
-            vals = line.split()
-            x_samples.append(float(vals[0]))
-            y_samples.append(float(vals[1]))
-    return np.array(x_samples), np.array(y_samples)
+    major = int(np.ceil(np.sqrt(n)))
+    x, y = orthogonal_native(w, h, major ** 2, rng, major)
+
+    # Subsquare (i, j) is sample i * major + j of the run, empty subsquares k are (k, k) then (k, k + 1).
+    k = np.arange(major ** 2 - n)
+    keep = np.ones((major, major), dtype=bool)
+    keep[k % major, (k + k // major) % major] = False
+    return x[keep.ravel()], y[keep.ravel()]
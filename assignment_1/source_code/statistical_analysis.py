@@ -1,12 +1,138 @@
 import numpy as np
+from contextlib import nullcontext
+from multiprocessing import Pool
 
 import mandelbrot
-from statistical_analysis_utils import recursive_sample_mean, recursive_sample_variance, confidence_interval_ppf
+from statistical_analysis_utils import OnlineStatistics, replicates_needed
 from monte_carlo import monte_carlo_integration
+from iteration_cache import IterationCache
+from checkpoint import config_key
 from sampling_method import pure_random, halton_sequence
 
+REPLICATE_BATCH = 16  # Number of simulations run between two checks of the stopping rule in parallel mode
+MAX_REPLICATES = 10000  # Maximal number of simulations of the sequential stopping rule
+REDUCE_CHUNK = 4  # Number of simulations reduced into one OnlineStatistics by a worker in parallel mode
 
-def confidence_interval_estimate(l, k, s, i, re, im, w, h, sampling_method=pure_random):
+
+def _seed(seed, t):
+    """
+    Seed of the simulation t given the root seed of a set of simulations:
+    the t-th child spawned from np.random.SeedSequence(seed).
+    """
+    if seed is None:
+        return None
+    return np.random.SeedSequence(seed, spawn_key=(t,))
+
+
+def _simulation(task):
+    """
+    Run one Monte Carlo simulation and return the estimated area.
+    :param task: tuple (s, i, re, im, w, h, sampling_method, seed, cache, rng)
+    """
+    s, i, re, im, w, h, sampling_method, seed, cache, rng = task
+    a, _, _ = monte_carlo_integration(re, im, w, h, s, i, sampling_method, cache=cache, seed=seed, rng=rng)
+    return a
+
+
+def _tasks(pool, start, n, s, i, re, im, w, h, sampling_method, seed, cache, rng):
+    """
+    Tasks of _simulation of the simulations start, ..., start + n - 1.
+    In parallel mode the workers draw from their own seeds (not rng) and only share the states saved on disk
+    by the cache.
+    """
+    if pool is not None:
+        cache = None if cache is None or cache.directory is None else IterationCache(cache.directory)
+        rng = None
+    return [(s, i, re, im, w, h, sampling_method, _seed(seed, t), cache, rng) for t in range(start, start + n)]
+
+
+def _simulations(pool, start, n, s, i, re, im, w, h, sampling_method, seed, cache, rng):
+    """
+    Run the simulations start, ..., start + n - 1, serially or in the process pool.
+    :return: list of estimated areas, in order of simulation
+    """
+    tasks = _tasks(pool, start, n, s, i, re, im, w, h, sampling_method, seed, cache, rng)
+    if pool is None:
+        return [_simulation(task) for task in tasks]
+    return pool.map(_simulation, tasks, chunksize=1)
+
+
+def _simulation_statistics(tasks):
+    """
+    Run several Monte Carlo simulations and reduce their estimated areas.
+    :param tasks: list of tasks of _simulation
+    :return: OnlineStatistics
+    """
+    return OnlineStatistics([_simulation(task) for task in tasks])
+
+
+def _statistics(pool, start, n, s, i, re, im, w, h, sampling_method, seed, cache, rng):
+    """
+    Run the simulations start, ..., start + n - 1, serially or in the process pool, and reduce their estimated areas.
+    The simulations are reduced by chunks of REDUCE_CHUNK (by a worker in parallel mode) which are merged in order,
+    so the result does not depend on the number of processes.
+    :return: OnlineStatistics
+    """
+    tasks = _tasks(pool, start, n, s, i, re, im, w, h, sampling_method, seed, cache, rng)
+    chunks = [tasks[j:j + REDUCE_CHUNK] for j in range(0, n, REDUCE_CHUNK)]
+    if pool is None:
+        chunks = map(_simulation_statistics, chunks)
+    else:
+        chunks = pool.map(_simulation_statistics, chunks, chunksize=1)
+
+    statistics = OnlineStatistics()
+    for chunk in chunks:
+        statistics.merge(chunk)
+    return statistics
+
+
+def _replicate_runner(seed, rng, processes):
+    """
+    Root seed and process pool (None in serial mode) of a set of simulations.
+    In parallel mode each simulation needs its own seed: a root seed is drawn (from rng if given) when none is given.
+    """
+    if processes is None:
+        return seed, nullcontext()
+    if seed is None:
+        seed = np.random.SeedSequence().entropy if rng is None else int(rng.integers(2**63))
+    return seed, Pool(processes)
+
+
+def _stage(name, **config):
+    """
+    Name of the checkpoint stage of a set of simulations, keyed by its parameters.
+    """
+    return '{0}-{1}'.format(name, config_key(config))
+
+
+def _resume(checkpoint, stage, seed, rng):
+    """
+    Running statistics, number of completed simulations and root seed saved in a checkpoint stage,
+    the state of rng is restored. Empty statistics and the given seed when nothing was saved.
+    :return: OnlineStatistics, number of completed simulations, root seed, dict of the saved arrays
+    """
+    statistics = OnlineStatistics()
+    data = None if checkpoint is None else checkpoint.load(stage, rng)
+    if data is None:
+        return statistics, 0, seed, {}
+
+    statistics.n, statistics.mean, statistics.m2 = int(data['n']), float(data['mean']), float(data['m2'])
+    seed = None if str(data['seed']) == '' else int(str(data['seed']))
+    return statistics, data['completed'], seed, data
+
+
+def _save(checkpoint, stage, statistics, it, seed, rng, done=False, **arrays):
+    """
+    Save the running statistics, the number of completed simulations, the root seed and the state of rng.
+    """
+    if checkpoint is not None:
+        checkpoint.save(stage, it, done, rng, n=statistics.n, mean=statistics.mean, m2=statistics.m2,
+                        seed='' if seed is None else str(seed), **arrays)
+
+
+def confidence_interval_estimate(l, k, s, i, re, im, w, h, sampling_method=pure_random, seed=None, cache=None, rng=None,
+                                 processes=None, batch_size=REPLICATE_BATCH, checkpoint=None,
+                                 stage='confidence_interval_estimate'):
     """
     Compute mandelbrot set area sample mean, variance and confidence interval (assuming central limit theorem).
     Continue simulations until interval condition is met.
@@ -15,26 +141,82 @@ def confidence_interval_estimate(l, k, s, i, re, im, w, h, sampling_method=pure_
     :param s: Number of samples for Monte carlo
     :param i: Maximal number of iteration
     :param sampling_method: sampling method used
+    :param seed: root seed of the simulations, simulation t is seeded by the t-th child of SeedSequence(seed)
+    :param cache: IterationCache, reuse iterations of previous calls with the same seed and a lower i
+    :param rng: numpy.random.Generator used by all simulations in serial mode, or to draw the root seed
+    :param processes: run simulations by batches in a pool of processes (None: serial, one at a time)
+    :param batch_size: number of simulations per batch in parallel mode (results do not depend on processes)
+    :param checkpoint: Checkpoint, save the running statistics, the root seed and the RNG state after each simulation
+        (each batch in parallel mode), and resume from the last save
+    :param stage: name of the checkpoint stage (the parameters are appended to it)
     :return: sample mean, sample variance and confidence interval
     """
-    x = []
-    s2_ = x0_ = x1_ = 0
-    interval = 1
-    it = 0
+    stage = _stage(stage, l=l, k=k, s=s, i=i, re=re, im=im, w=w, h=h, sampling_method=sampling_method, seed=seed,
+                   parallel=processes is not None, batch_size=batch_size)
+    statistics, it, seed, _ = _resume(checkpoint, stage, seed, rng)
+    ci_min, ci_max, interval = statistics.confidence_interval(0.05) if it > 0 else (0, 0, 1)
+
+    seed, runner = _replicate_runner(seed, rng, processes)
+    with runner as pool:
+        while it < k or interval >= l:
+            n = 1 if pool is None else batch_size
+            statistics.merge(_statistics(pool, it, n, s, i, re, im, w, h, sampling_method, seed, cache, rng))
+            ci_min, ci_max, interval = statistics.confidence_interval(0.05)
+            it += n
+            _save(checkpoint, stage, statistics, it, seed, rng, done=it >= k and interval < l)
+
+    return statistics.mean, statistics.variance, ci_min, ci_max, it
+
+
+def sequential_estimate(l, k, s, i, re, im, w, h, sampling_method=pure_random, seed=None, cache=None, rng=None,
+                        processes=None, check_every=REPLICATE_BATCH, max_replicates=MAX_REPLICATES, alpha=0.05,
+                        checkpoint=None, stage='sequential_estimate'):
+    """
+    Compute mandelbrot set area sample mean, variance and confidence interval (assuming central limit theorem).
+    Sequential stopping rule: run k simulations, then until the interval is shorter than l, estimate from the current
+    variance the number of simulations still needed and run them as one batch (at least check_every at a time).
+    :param l: maximal length of confidence interval
+    :param k: Minimal number of simulation to run
+    :param s: Number of samples for Monte carlo
+    :param i: Maximal number of iteration
+    :param sampling_method: sampling method used
+    :param seed: root seed of the simulations, simulation t is seeded by the t-th child of SeedSequence(seed)
+    :param cache: IterationCache, reuse iterations of previous calls with the same seed and a lower i
+    :param rng: numpy.random.Generator used by all simulations in serial mode, or to draw the root seed
+    :param processes: run the batches in a pool of processes (None: serial)
+    :param check_every: minimal number of simulations between two checks of the stopping rule
+    :param max_replicates: maximal number of simulations, the interval may be longer than l when it is reached
+    :param alpha: probability of being outside confidence interval
+    :param checkpoint: Checkpoint, save the running statistics, the root seed and the RNG state after each batch,
+        and resume from the last save
+    :param stage: name of the checkpoint stage (the parameters are appended to it)
+    :return: sample mean, sample variance, confidence interval and number of simulations
+    """
+    stage = _stage(stage, l=l, k=k, s=s, i=i, re=re, im=im, w=w, h=h, sampling_method=sampling_method, seed=seed,
+                   check_every=check_every, max_replicates=max_replicates, alpha=alpha)
+    statistics, it, seed, _ = _resume(checkpoint, stage, seed, rng)
+    interval = np.inf
+    n = max(k, 1)
+    if it > 0:
+        ci_min, ci_max, interval = statistics.confidence_interval(alpha)
+        n = max(check_every, replicates_needed(statistics.standard_deviation, l, alpha) - it)
 
-    while it < k or interval >= l:
-        a, _, _ = monte_carlo_integration(re, im, w, h, s, i, sampling_method)
-        x.append(a)
-        x1_ = recursive_sample_mean(a, x0_, len(x) - 1)
-        s2_ = recursive_sample_variance(s2_, x1_, x0_, len(x) - 1)
-        x0_ = x1_
-        min, max, interval = confidence_interval_ppf(x1_, np.sqrt(s2_), 0.05, len(x))
-        it += 1
+    seed, runner = _replicate_runner(seed, rng, processes)
+    with runner as pool:
+        while interval >= l and it < max_replicates:
+            n = min(n, max_replicates - it)
+            statistics.merge(_statistics(pool, it, n, s, i, re, im, w, h, sampling_method, seed, cache, rng))
+            it += n
+            ci_min, ci_max, interval = statistics.confidence_interval(alpha)
+            n = max(check_every, replicates_needed(statistics.standard_deviation, l, alpha) - it)
+            _save(checkpoint, stage, statistics, it, seed, rng, done=interval < l or it >= max_replicates)
 
-    return x1_, s2_, min, max, it
+    return statistics.mean, statistics.variance, ci_min, ci_max, it
 
 
-def confidence_interval_estimate_details(l, k, s, i, re, im, w, h, sampling_method=pure_random):
+def confidence_interval_estimate_details(l, k, s, i, re, im, w, h, sampling_method=pure_random, seed=None, cache=None, rng=None,
+                                         processes=None, batch_size=REPLICATE_BATCH, checkpoint=None,
+                                         stage='confidence_interval_estimate_details'):
     """
     Compute mandelbrot set area sample mean, variance and confidence interval (assuming central limit theorem).
     Continue simulations until interval condition is met
@@ -43,28 +225,39 @@ def confidence_interval_estimate_details(l, k, s, i, re, im, w, h, sampling_meth
     :param s: Number of samples for Monte carlo
     :param i: Maximal number of iteration
     :param sampling_method: sampling method used
+    :param seed: root seed of the simulations, simulation t is seeded by the t-th child of SeedSequence(seed)
+    :param cache: IterationCache, reuse iterations of previous calls with the same seed and a lower i
+    :param rng: numpy.random.Generator used by all simulations in serial mode, or to draw the root seed
+    :param processes: run simulations by batches in a pool of processes (None: serial, one at a time)
+    :param batch_size: number of simulations per batch in parallel mode (results do not depend on processes)
+    :param checkpoint: Checkpoint, save the running statistics, the root seed and the RNG state after each simulation
+        (each batch in parallel mode), and resume from the last save
+    :param stage: name of the checkpoint stage (the parameters are appended to it)
     :return: sample mean, sample variance and confidence interval
     """
-    x = []
-    s2_ = x0_ = x1_ = 0
-    interval = 1
-    it = 0
-    vars = []
+    stage = _stage(stage, l=l, k=k, s=s, i=i, re=re, im=im, w=w, h=h, sampling_method=sampling_method, seed=seed,
+                   parallel=processes is not None, batch_size=batch_size)
+    statistics, it, seed, data = _resume(checkpoint, stage, seed, rng)
+    vars = list(data.get('vars', []))
+    ci_min, ci_max, interval = statistics.confidence_interval(0.05) if it > 0 else (0, 0, 1)
 
-    while it < k or interval >= l:
-        a, _, _ = monte_carlo_integration(re, im, w, h, s, i, sampling_method)
-        x.append(a)
-        x1_ = recursive_sample_mean(a, x0_, len(x) - 1)
-        s2_ = recursive_sample_variance(s2_, x1_, x0_, len(x) - 1)
-        vars.append(s2_)
-        x0_ = x1_
-        min, max, interval = confidence_interval_ppf(x1_, np.sqrt(s2_), 0.05, len(x))
-        it += 1
+    seed, runner = _replicate_runner(seed, rng, processes)
+    with runner as pool:
+        while it < k or interval >= l:
+            # The variance after each simulation is needed, the estimated areas are added one at a time.
+            for a in _simulations(pool, it, 1 if pool is None else batch_size, s, i, re, im, w, h, sampling_method, seed, cache, rng):
+                statistics.update(a)
+                vars.append(statistics.variance)
+                it += 1
+            ci_min, ci_max, interval = statistics.confidence_interval(0.05)
+            _save(checkpoint, stage, statistics, it, seed, rng, done=it >= k and interval < l, vars=np.array(vars))
 
-    return x1_, s2_, min, max, it, vars
+    return statistics.mean, statistics.variance, ci_min, ci_max, it, vars
 
 
-def confidence_interval_estimate_fixed(k, s, i, re, im, w, h, sampling_method=pure_random):
+def confidence_interval_estimate_fixed(k, s, i, re, im, w, h, sampling_method=pure_random, seed=None, cache=None, rng=None,
+                                       processes=None, batch_size=REPLICATE_BATCH, checkpoint=None,
+                                       stage='confidence_interval_estimate_fixed'):
     """
     Compute mandelbrot set area sample mean, variance and confidence interval (assuming central limit theorem).
     Interval given fixed number of simulations
@@ -72,22 +265,30 @@ def confidence_interval_estimate_fixed(k, s, i, re, im, w, h, sampling_method=pu
     :param s: Number of samples for Monte carlo
     :param i: Iteration
     :param sampling_method: sampling method used
+    :param seed: root seed of the simulations, simulation t is seeded by the t-th child of SeedSequence(seed)
+    :param cache: IterationCache, reuse iterations of previous calls with the same seed and a lower i
+    :param rng: numpy.random.Generator used by all simulations in serial mode, or to draw the root seed
+    :param processes: run simulations by batches in a pool of processes (None: serial, one at a time)
+    :param batch_size: number of simulations per batch (results do not depend on processes)
+    :param checkpoint: Checkpoint, save the running statistics, the root seed and the RNG state after each batch,
+        and resume from the last save
+    :param stage: name of the checkpoint stage (the parameters are appended to it)
     :return: sample mean, sample variance and confidence interval
     """
-    x = []
-    s2_ = x0_ = x1_ = 0
-    it = 0
+    stage = _stage(stage, k=k, s=s, i=i, re=re, im=im, w=w, h=h, sampling_method=sampling_method, seed=seed,
+                   batch_size=batch_size)
+    statistics, it, seed, _ = _resume(checkpoint, stage, seed, rng)
 
-    while it < k:
-        a, _, _ = monte_carlo_integration(re, im, w, h, s, i, sampling_method)
-        x.append(a)
-        x1_ = recursive_sample_mean(a, x0_, len(x) - 1)
-        s2_ = recursive_sample_variance(s2_, x1_, x0_, len(x) - 1)
-        x0_ = x1_
-        min, max, interval = confidence_interval_ppf(x1_, np.sqrt(s2_), 0.05, len(x))
-        it += 1
+    seed, runner = _replicate_runner(seed, rng, processes)
+    with runner as pool:
+        while it < k:
+            n = min(batch_size, k - it)  # No stopping rule, serial mode runs batches as well
+            statistics.merge(_statistics(pool, it, n, s, i, re, im, w, h, sampling_method, seed, cache, rng))
+            it += n
+            _save(checkpoint, stage, statistics, it, seed, rng, done=it >= k)
 
-    return x1_, s2_, min, max
+    ci_min, ci_max, interval = statistics.confidence_interval(0.05)
+    return statistics.mean, statistics.variance, ci_min, ci_max
 
 
 if __name__ == '__main__':
@@ -1,4 +1,5 @@
 import numpy as np
+from functools import lru_cache
 from scipy.stats import norm
 
 
@@ -57,6 +58,44 @@ def sample_standard_deviation(x):
     return np.sqrt(sample_variance(x))
 
 
+def max_relative_difference(x, axis=0):
+    """
+    Compute maximal relative difference |a - b| / |a + b| among all pairs of values along an axis.
+    For non-negative values (e.g. areas), the maximum is reached by the minimal and maximal values,
+    so there is no need to compare the n(n-1)/2 pairs. Pairs with a + b = 0 are ignored.
+    :param x: non-negative output data
+    :param axis: axis of the values to compare (e.g. simulations)
+    :return: maximal relative difference, array with axis removed
+    """
+    x_min = np.min(x, axis=axis)
+    x_max = np.max(x, axis=axis)
+    total = np.asarray(x_max + x_min, dtype=np.float64)
+    return np.divide(x_max - x_min, total, out=np.zeros_like(total), where=total != 0)
+
+
+@lru_cache(maxsize=None)
+def normal_quantile(alpha):
+    """
+    Quantile z of the standard normal distribution such that P(|Z| > z) = alpha.
+    Computed once per alpha, the stopping rules call it after each simulation.
+    :param alpha: probability of being outside confidence interval
+    :return: z, float
+    """
+    p = 1 - alpha
+    return float(norm.ppf((p + 1) / 2.))
+
+
+def replicates_needed(s_, l, alpha):
+    """
+    Number of values needed for the confidence interval to be shorter than l, given the sample standard deviation.
+    :param s_: sample standard deviation
+    :param l: maximal length of confidence interval
+    :param alpha: probability of being outside confidence interval
+    :return: minimal n such that 2 * z * s_ / sqrt(n) < l, int
+    """
+    return int(np.floor((2 * normal_quantile(alpha) * s_ / l) ** 2)) + 1
+
+
 def confidence_interval_ppf(x_, s_, alpha, n):
     """
     Compute confidence interval estimate of theta, the expected population value.
@@ -66,11 +105,83 @@ def confidence_interval_ppf(x_, s_, alpha, n):
     :param n: Number of values
     :return: min/max/length of confidence interval estimate range
     """
-    p = 1 - alpha
-    z = norm.ppf((p + 1) / 2.)
+    z = normal_quantile(alpha)
 
     min = x_ - z * (s_ / np.sqrt(n))
     max = x_ + z * (s_ / np.sqrt(n))
     len = 2 * z * (s_ / np.sqrt(n))
 
     return min, max, len
+
+
+class OnlineStatistics:
+    """
+    Online sample mean and variance of a stream of output data (Welford), updated by batches of values.
+    Two accumulators are merged with the pairwise formula of Chan et al., so partial results of
+    simulations run in parallel are reduced without gathering the data.
+    """
+    def __init__(self, values=None):
+        self.n = 0
+        self.mean = 0.
+        self.m2 = 0.  # Sum of squared differences to the mean
+        if values is not None:
+            self.update(values)
+
+    def update(self, values):
+        """
+        Add output data.
+        :param values: value or array of values
+        :return: self
+        """
+        x = np.asarray(values, dtype=np.float64).ravel()
+        if x.size == 1:
+            # Welford update
+            self.n += 1
+            delta = x[0] - self.mean
+            self.mean += delta / self.n
+            self.m2 += delta * (x[0] - self.mean)
+            return self
+
+        batch = OnlineStatistics()
+        if x.size > 0:
+            batch.n, batch.mean = x.size, sample_mean(x)
+            batch.m2 = np.sum(np.power(x - batch.mean, 2))
+        return self.merge(batch)
+
+    def merge(self, other):
+        """
+        Add the output data of another accumulator (Chan et al.).
+        :param other: OnlineStatistics
+        :return: self
+        """
+        n = self.n + other.n
+        if other.n == 0 or n == 0:
+            return self
+
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.m2 += other.m2 + delta ** 2 * self.n * other.n / n
+        self.n = n
+        return self
+
+    @property
+    def variance(self):
+        """
+        Sample variance S^2 of the data added so far (0 for less than 2 values).
+        """
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.
+
+    @property
+    def standard_deviation(self):
+        """
+        Sample standard deviation S of the data added so far.
+        """
+        return np.sqrt(self.variance)
+
+    def confidence_interval(self, alpha=0.05):
+        """
+        Confidence interval estimate of the expected value, see confidence_interval_ppf.
+        :param alpha: probability of being outside confidence interval
+        :return: min/max/length of confidence interval estimate range
+        """
+        return confidence_interval_ppf(self.mean, self.standard_deviation, alpha, self.n)
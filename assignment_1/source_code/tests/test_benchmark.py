@@ -0,0 +1,28 @@
+import os
+import tempfile
+import unittest
+from .. import benchmark
+
+
+class BenchmarkTestCase(unittest.TestCase):
+    def test_run_and_compare(self):
+        run = benchmark.run_benchmarks(list(benchmark.STAGES), grid=((200, 20, 30, 20),), warmup=0, repeats=2)
+        self.assertEqual([r['stage'] for r in run['results']], list(benchmark.STAGES))
+        for r in run['results']:
+            self.assertEqual(len(r['times']), 2)
+            self.assertGreater(r['throughput'], 0)
+            self.assertGreater(r['peak_memory'], 0)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'run.json')
+            benchmark.save(run, path)
+            baseline = benchmark.load(path)
+        self.assertEqual(benchmark.compare(baseline, baseline), [])
+
+        slower = {'results': [dict(r) for r in baseline['results']]}
+        slower['results'][0]['best'] *= 2
+        self.assertEqual(benchmark.compare(baseline, slower), [('mandelbrot', 200, 20, 30, 20, 'best', 2.)])
+
+
+if __name__ == '__main__':
+    unittest.main()
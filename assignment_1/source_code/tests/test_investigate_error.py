@@ -0,0 +1,64 @@
+import tempfile
+from functools import partial
+import unittest
+import numpy as np
+from .. import investigate_error
+from ..checkpoint import Checkpoint, config_key
+from ..sampling_method import pure_random
+from ..monte_carlo import monte_carlo_integration, area_by_iteration, area_by_sampling
+
+RE, IM = (-2.02, 0.49), (-1.15, 1.15)
+A = (RE[1] - RE[0]) * (IM[1] - IM[0])
+
+
+class InvestigateErrorTestCase(unittest.TestCase):
+    def test_area_stack_per_method(self):
+        area_stack = investigate_error.area_stack_per_method(RE, IM, 600, 400, 500, 80, 1, rng=np.random.default_rng(5))
+        rng = np.random.default_rng(5)
+        for m, method in enumerate(investigate_error.METHODS):
+            _, _, details = monte_carlo_integration(RE, IM, 600, 400, 500, 80, method, rng=rng)
+            self.assertTrue(np.array_equal(area_stack[m, 0], area_by_iteration(details, 80, A)))
+
+        area_stack = investigate_error.area_stack_per_method(RE, IM, 600, 400, 500, 80, 7, by_iteration=False,
+                                                             rng=np.random.default_rng(5), chunk_size=2000)
+        self.assertEqual(area_stack.shape, (4, 7, 500))
+        rng = np.random.default_rng(5)
+        for t in range(2):
+            for m, method in enumerate(investigate_error.METHODS):
+                _, _, details = monte_carlo_integration(RE, IM, 600, 400, 500, 80, method, rng=rng)
+                self.assertTrue(np.array_equal(area_stack[m, t], area_by_sampling(details, 80, A)))
+
+    def test_area_stack_checkpoint(self):
+        expected = investigate_error.area_stack_per_method(RE, IM, 600, 400, 300, 50, 4, methods=(pure_random,),
+                                                           rng=np.random.default_rng(5), chunk_size=300)
+        calls = []
+
+        def interrupted(w, h, n, rng=None):
+            calls.append(n)
+            if len(calls) == 3:
+                raise KeyboardInterrupt
+            return pure_random(w, h, n, rng)
+
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = Checkpoint(directory, test='area')
+            with self.assertRaises(KeyboardInterrupt):
+                investigate_error.area_stack_per_method(RE, IM, 600, 400, 300, 50, 4, methods=(interrupted,),
+                                                        rng=np.random.default_rng(5), chunk_size=300, checkpoint=checkpoint)
+            self.assertEqual(checkpoint.load('area')['completed'], 2)
+
+            # The rerun resumes from the third simulation with the saved RNG state.
+            area_stack = investigate_error.area_stack_per_method(RE, IM, 600, 400, 300, 50, 4, methods=(pure_random,),
+                                                                 chunk_size=300, checkpoint=checkpoint)
+            self.assertTrue(np.array_equal(area_stack, expected))
+            self.assertTrue(checkpoint.load('area')['done'])
+
+    def test_config_key(self):
+        # Keys do not depend on memory addresses: partial functions are keyed by their function and arguments.
+        key = config_key({'method': partial(pure_random, rng=None), 's': np.int64(3)})
+        self.assertEqual(config_key({'method': partial(pure_random, rng=None), 's': 3}), key)
+        self.assertNotEqual(config_key({'method': partial(pure_random, rng=1), 's': 3}), key)
+        self.assertRaises(TypeError, config_key, {'value': object()})
+
+
+if __name__ == '__main__':
+    unittest.main()
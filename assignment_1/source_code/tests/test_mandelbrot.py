@@ -0,0 +1,224 @@
+import os
+import tempfile
+import threading
+import unittest
+from decimal import Decimal
+from unittest import mock
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+from .. import mandelbrot
+from .. import iteration_cache
+from .. import tile_cache
+
+
+class MandelbrotTestCase(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        x = rng.uniform(0, mandelbrot.WIDTH, 2000)
+        y = rng.uniform(0, mandelbrot.HEIGHT, 2000)
+        self.x, self.y = x, y
+        self.c = [mandelbrot.grid_map(a, b) for a, b in zip(x, y)]
+
+    def test_grid_map_batch(self):
+        c = mandelbrot.grid_map_batch(self.x, self.y)
+        self.assertTrue(np.array_equal(c, np.array(self.c)))
+
+    def test_mandelbrot_batch(self):
+        expected = [mandelbrot.mandelbrot(c, 200) for c in self.c]
+        counts = mandelbrot.mandelbrot_batch(np.array(self.c), 200)
+        self.assertTrue(np.array_equal(counts, expected))
+
+        counts = mandelbrot.mandelbrot_batch(np.array(self.c).reshape(40, 50), 200)
+        self.assertEqual(counts.shape, (40, 50))
+        self.assertTrue(np.array_equal(counts.ravel(), expected))
+
+    def test_check_bulbs(self):
+        self.assertTrue(mandelbrot.in_main_cardioid(complex(0, 0)))
+        self.assertTrue(mandelbrot.in_period2_bulb(complex(-1, 0.1)))
+        self.assertFalse(mandelbrot.in_main_cardioid(complex(-1, 0)))
+        self.assertFalse(mandelbrot.in_period2_bulb(complex(0.3, 0)))
+
+        c = np.array(self.c)
+        expected = mandelbrot.mandelbrot_batch(c, 300)
+        self.assertTrue(np.array_equal(mandelbrot.mandelbrot_batch(c, 300, check_bulbs=True), expected))
+        self.assertEqual([mandelbrot.mandelbrot(v, 300, check_bulbs=True) for v in self.c], list(expected))
+
+    def test_check_period(self):
+        expected = [mandelbrot.mandelbrot(c, 1000) for c in self.c]
+        result = [mandelbrot.mandelbrot(c, 1000, check_period=True, return_reason=True) for c in self.c]
+        self.assertEqual([n for n, _ in result], expected)
+
+        reasons = [reason for _, reason in result]
+        self.assertIn(mandelbrot.STOP_CYCLE, reasons)
+        for n, reason in result:
+            self.assertEqual(reason == mandelbrot.STOP_ESCAPE, n < 1000)
+
+        fz, reason = mandelbrot.mandelbrot_detailed(complex(-0.1, 0.1), 1000, check_period=True, return_reason=True)
+        self.assertEqual(reason, mandelbrot.STOP_CYCLE)
+        self.assertLess(len(fz), 1001)
+        self.assertEqual(mandelbrot.mandelbrot_detailed(complex(1, 1), 1000, return_reason=True)[1], mandelbrot.STOP_ESCAPE)
+        self.assertEqual(mandelbrot.mandelbrot(complex(-1, 0), 50, return_reason=True), (50, mandelbrot.STOP_MAX_ITER))
+
+    def test_iteration_cache(self):
+        c = np.array(self.c)
+        with tempfile.TemporaryDirectory() as directory:
+            cache = iteration_cache.IterationCache(directory)
+            for max_iter in [60, 100, 80, 250]:
+                counts = cache.counts(c, max_iter, seed=1)
+                self.assertTrue(np.array_equal(counts, mandelbrot.mandelbrot_batch(c, max_iter)))
+            self.assertEqual(len(os.listdir(directory)), 1)
+
+            # A new cache resumes from the state saved on disk.
+            state = iteration_cache.IterationCache(directory).get(c, seed=1)
+            self.assertEqual(state.max_iter, 250)
+            self.assertTrue(np.array_equal(state.counts(400), mandelbrot.mandelbrot_batch(c, 400)))
+
+        # Unseeded samples are not cached, and the memory budget evicts the least recently used states.
+        cache = iteration_cache.IterationCache(max_bytes=2 * iteration_cache.EscapeState(c).nbytes)
+        self.assertTrue(np.array_equal(cache.counts(c, 60), mandelbrot.mandelbrot_batch(c, 60)))
+        self.assertEqual(len(cache.states), 0)
+        for seed in range(3):
+            cache.counts(c, 60, seed=seed)
+        self.assertEqual(list(cache.states), [cache.key(c, 1), cache.key(c, 2)])
+        self.assertEqual(cache.nbytes, 2 * iteration_cache.EscapeState(c).nbytes)
+
+    def test_mandelbrot_area_bounds(self):
+        lower, upper = mandelbrot.mandelbrot_area_bounds(max_iter=300, depth=5)
+        finer_lower, finer_upper = mandelbrot.mandelbrot_area_bounds(max_iter=300, depth=6)
+        self.assertTrue(lower <= finer_lower < 1.5066 < finer_upper <= upper)
+
+        # Each lattice point is computed once: far fewer points than a dense grid with one point per finest cell.
+        with mock.patch.object(mandelbrot, 'mandelbrot_batch', wraps=mandelbrot.mandelbrot_batch) as batch:
+            mandelbrot.mandelbrot_area_bounds(max_iter=300, depth=7)
+        points = np.concatenate([call.args[0] for call in batch.call_args_list])
+        self.assertEqual(np.unique(points).size, points.size)
+        self.assertLess(points.size, 128 * 128 / 2)
+
+    def test_mandelbrot_batch_period(self):
+        c = np.random.default_rng(0).uniform(-2, 0.5, 500) + 1j * np.random.default_rng(1).uniform(-1.2, 1.2, 500)
+        counts = mandelbrot.mandelbrot_batch(c, 300, check_bulbs=True, check_period=True)
+        self.assertEqual(counts.tolist(), [mandelbrot.mandelbrot(v, 300, True, True) for v in c])
+
+    def test_mandelbrot_set(self):
+        w, h, max_iter = 60, 40, 50
+        re, im = (-2.02, 0.49), (-1.15, 1.15)
+        img = np.array(mandelbrot.mandelbrot_set(re, im, max_iter, w, h))
+        self.assertEqual(img.shape, (h, w, 3))
+
+        table = mandelbrot.color_table(max_iter)
+        for x, y in [(0, 1), (30, 20), (59, 39), (12, 33)]:
+            n = mandelbrot.mandelbrot(mandelbrot.grid_map(x, y, re, im, w, h), max_iter)
+            self.assertTrue(np.array_equal(img[h - y, x], table[n]))
+
+        # The cached mode renders tiles of tile_size pixels.
+        cache = tile_cache.TileCache()
+        img = np.array(mandelbrot.mandelbrot_set(re, im, max_iter, w, h, tile_size=16, cache=cache))
+        self.assertEqual(img.shape, (h, w, 3))
+        self.assertTrue(all(tile.shape == (16, 16) for tile in cache.tiles.values()))
+
+        # Tiles of another size are cached separately.
+        self.assertTrue(np.array_equal(np.array(mandelbrot.mandelbrot_set(re, im, max_iter, w, h, cache=cache)), img))
+        self.assertEqual({key[-1] for key in cache.tiles}, {16, mandelbrot.TILE_SIZE})
+
+    def test_mandelbrot_grid_tiled(self):
+        expected = mandelbrot.mandelbrot_grid(max_iter=80, w=90, h=70)
+        counts = mandelbrot.mandelbrot_grid_tiled(max_iter=80, w=90, h=70, processes=2, tile_size=32)
+        self.assertTrue(np.array_equal(counts, expected))
+
+    def test_mandelbrot_set_progressive(self):
+        re, im = (-2.02, 0.49), (-1.15, 1.15)
+        images = list(mandelbrot.mandelbrot_set_progressive(re, im, 60, 150, 100, passes=(8, 2, 1)))
+        self.assertEqual([img.size for img in images], [(18, 12), (75, 50), (150, 100)])
+        self.assertTrue(np.array_equal(np.array(images[-1]), np.array(mandelbrot.mandelbrot_set(re, im, 60, 150, 100))))
+
+        cancel = threading.Event()
+        images = mandelbrot.mandelbrot_set_progressive(re, im, 60, 150, 100, cancel=cancel)
+        next(images)
+        cancel.set()
+        self.assertEqual(list(images), [])
+
+        # The full resolution pass from the tile cache is cancelled between tiles.
+        cache = tile_cache.TileCache()
+        images = mandelbrot.mandelbrot_set_progressive(re, im, 60, passes=(1,), cancel=cancel, cache=cache)
+        self.assertEqual(list(images), [])
+        self.assertIsNone(mandelbrot.mandelbrot_grid_cached(re, im, 60, cache=cache, cancel=cancel))
+        self.assertEqual(len(cache.tiles), 0)
+
+    def test_zoom_tool(self):
+        fig = plt.figure()
+        tool = mandelbrot.ZoomTool(fig.subplots(), (-2.02, 0.49), (-1.15, 1.15))
+        tool.connect()
+        tool.render((-1, 0), (0, 1))
+        cancelled = tool.cancel
+        tool.render((-0.5, 0), (0, 0.5))
+        tool.worker.join()
+        self.assertTrue(cancelled.is_set())
+
+        tool.update()
+        self.assertEqual(tool.image.get_array().shape, (mandelbrot.HEIGHT, mandelbrot.WIDTH, 3))
+        self.assertEqual(list(tool.image.get_extent()), [-0.5, 0, 0, 0.5])
+
+        # A cancelled deep zoom render queues no image.
+        tool._render((-5e-17, 5e-17), (-3e-17, 3e-17), ('-0.75', '0.1'), cancelled)
+        self.assertTrue(tool.passes.empty())
+        tool.disconnect()
+        plt.close(fig)
+
+    def test_tile_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = tile_cache.TileCache(max_bytes=2 * 8 * 16, directory=directory)
+            for n in range(3):
+                cache.put((0, (n, 0), 50, 4), np.full((4, 4), n))
+            self.assertEqual(list(cache.tiles), [(0, (1, 0), 50, 4), (0, (2, 0), 50, 4)])
+            self.assertIn((0, (0, 0), 50, 4), cache)
+            self.assertNotIn((0, (0, 0), 50, 8), cache)
+            self.assertTrue(np.array_equal(cache.get((0, (0, 0), 50, 4)), np.zeros((4, 4))))
+            self.assertIsNone(cache.get((1, (0, 0), 50, 4)))
+
+    def test_mandelbrot_grid_cached(self):
+        re = (-1.2, -1.2 + (mandelbrot.RE_MAX - mandelbrot.RE_MIN) / 10)  # Zoom x10
+        im = (0.1, 0.1 + (mandelbrot.IM_MAX - mandelbrot.IM_MIN) / 10)
+        cache = tile_cache.TileCache()
+        counts = mandelbrot.mandelbrot_grid_cached(re, im, 80, mandelbrot.WIDTH, mandelbrot.HEIGHT, cache, tile_size=32)
+
+        # Grid snapped on the lattice of zoom level 1.
+        dx, dy = (mandelbrot.RE_MAX - mandelbrot.RE_MIN) / mandelbrot.WIDTH / 10, (mandelbrot.IM_MAX - mandelbrot.IM_MIN) / mandelbrot.HEIGHT / 10
+        px = round(re[0] / dx) + np.arange(mandelbrot.WIDTH)[np.newaxis, :]
+        py = round(im[0] / dy) + mandelbrot.HEIGHT - np.arange(mandelbrot.HEIGHT)[:, np.newaxis]
+        self.assertTrue(np.array_equal(counts, mandelbrot.mandelbrot_batch(px * dx + 1j * (py * dy), 80)))
+
+        # An overlapping grid only computes the missing tiles.
+        misses = cache.misses
+        shifted = mandelbrot.mandelbrot_grid_cached((re[0] + 40 * dx, re[1] + 40 * dx), im, 80, mandelbrot.WIDTH, mandelbrot.HEIGHT,
+                                                    cache, tile_size=32)
+        self.assertTrue(np.array_equal(shifted[:, :-40], counts[:, 40:]))
+        self.assertLessEqual(cache.misses - misses, 2 * 14)
+        self.assertTrue(mandelbrot.tiles_cached(re, im, 80, mandelbrot.WIDTH, mandelbrot.HEIGHT, cache, tile_size=32))
+
+    def test_mandelbrot_grid_deep(self):
+        # Same result as the float64 grid at a shallow zoom.
+        counts = mandelbrot.mandelbrot_grid_deep(('-0.75', '0.1'), (-0.05, 0.05), (-0.04, 0.04), 300, 90, 60)
+        self.assertTrue(np.array_equal(counts, mandelbrot.mandelbrot_grid((-0.8, -0.7), (0.06, 0.14), 300, 90, 60)))
+
+        # Beyond float64 resolution, same result as the high precision iteration of the pixels.
+        center = ('-0.743643887037158704752191506114774', '0.131825904205311970493132056385139')
+        counts = mandelbrot.mandelbrot_grid_deep(center, (-5e-17, 5e-17), (-3e-17, 3e-17), 10000, 30, 20)
+        self.assertGreater(len(np.unique(counts)), 100)
+        for x, y in [(3, 17), (21, 4)]:
+            dc = mandelbrot.grid_map_batch(x, 20 - y, (-5e-17, 5e-17), (-3e-17, 3e-17), 30, 20)
+            orbit = mandelbrot.reference_orbit((Decimal(center[0]) + Decimal(dc.real.item()),
+                                                Decimal(center[1]) + Decimal(dc.imag.item())), 10000, 50)
+            self.assertEqual(counts[y, x], orbit.size - 1 if np.abs(orbit[-1]) > 2 else 10000)
+
+        cancel = threading.Event()
+        cancel.set()
+        self.assertIsNone(mandelbrot.mandelbrot_grid_deep(center, (-5e-17, 5e-17), (-3e-17, 3e-17), 10000, 30, 20,
+                                                          cancel=cancel))
+        self.assertEqual(mandelbrot.deep_max_iter((mandelbrot.RE_MIN, mandelbrot.RE_MAX)), mandelbrot.MAX_ITER)
+        self.assertGreater(mandelbrot.deep_max_iter((0, mandelbrot.DEEP_ZOOM_WIDTH)), 20 * mandelbrot.MAX_ITER)
+
+
+if __name__ == '__main__':
+    unittest.main()
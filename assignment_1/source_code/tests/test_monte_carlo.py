@@ -0,0 +1,78 @@
+import unittest
+import numpy as np
+from .. import monte_carlo
+from ..sampling_method import halton, halton_sequence, HALTON_SKIP
+
+RE, IM = (-2.02, 0.49), (-1.15, 1.15)
+
+
+class MonteCarloTestCase(unittest.TestCase):
+    def test_monte_carlo_streaming(self):
+        a, _, details = monte_carlo.monte_carlo_integration(RE, IM, 600, 400, 3000, 200, seed=0)
+        b, details_b = monte_carlo.monte_carlo_streaming(RE, IM, 600, 400, 3000, 200, keep_details=True,
+                                                         rng=np.random.default_rng(0))
+        self.assertEqual(a, b)
+        self.assertTrue(np.array_equal(details, details_b))
+
+        b, details_b = monte_carlo.monte_carlo_streaming(RE, IM, 600, 400, 3000, 200, batch_size=700, keep_details=True,
+                                                         rng=np.random.default_rng(1))
+        self.assertIsNone(monte_carlo.monte_carlo_streaming(RE, IM, 600, 400, 3000, 200, batch_size=700)[1])
+        a = (RE[1] - RE[0]) * (IM[1] - IM[0])
+        self.assertEqual(b, (np.sum(details_b == 200) / 3000) * a)
+
+    def test_sample_batches_sequence(self):
+        batches = list(monte_carlo.sample_batches(600, 400, 200, halton_sequence, 100, np.random.default_rng(0)))
+        self.assertEqual(len(batches), 2)
+
+        # The second batch continues the Halton sequence (up to the jitter of one pixel) instead of repeating it.
+        x, y = batches[1]
+        self.assertLessEqual(np.abs(x - halton(100, 2, HALTON_SKIP + 100)[0] * 600).max(), 1)
+        self.assertGreater(np.abs(x - halton(100, 2, HALTON_SKIP)[0] * 600).max(), 1)
+        self.assertIsNone(monte_carlo.sequence_skip(monte_carlo.pure_random))
+
+    def test_monte_carlo_stratified(self):
+        a = (RE[1] - RE[0]) * (IM[1] - IM[0])
+        estimate, variance, n = monte_carlo.monte_carlo_stratified(RE, IM, 600, 400, 10000, 100,
+                                                                   rng=np.random.default_rng(0))
+        self.assertEqual(n.sum(), 10000)
+        self.assertEqual(n.shape, monte_carlo.STRATA)
+        self.assertLess(abs(estimate - 1.55), 0.05)
+
+        # Neyman allocation beats the variance of pure random sampling with the same number of samples.
+        p = estimate / a
+        self.assertLess(variance, a**2 * p * (1 - p) / 10000)
+
+        # The pilot pass stays within the budget: exactly 2 samples per cell, or an error below.
+        self.assertEqual(monte_carlo.monte_carlo_stratified(RE, IM, 600, 400, 128, 50)[2].sum(), 128)
+        self.assertRaises(ValueError, monte_carlo.monte_carlo_stratified, RE, IM, 600, 400, 100, 50)
+
+    def test_monte_carlo_stratified_sequence(self):
+        drawn = []
+
+        def sampler(w, h, n, rng=None, skip=HALTON_SKIP):
+            drawn.append((skip, n))
+            return halton_sequence(w, h, n, rng, skip)
+
+        _, _, n = monte_carlo.monte_carlo_stratified(RE, IM, 600, 400, 1000, 50, sampler, strata=(2, 2),
+                                                     rng=np.random.default_rng(0))
+        # Pilot pass of 50 samples per cell, then the second pass starts after them in every cell.
+        self.assertEqual(drawn[:4], [(HALTON_SKIP, 50)] * 4)
+        self.assertEqual([skip for skip, _ in drawn[4:]], [HALTON_SKIP + 50] * (len(drawn) - 4))
+
+    def test_area_curves(self):
+        details = np.random.default_rng(0).integers(0, 51, (3, 400)).astype(float)
+        a = (RE[1] - RE[0]) * (IM[1] - IM[0])
+        by_iteration = monte_carlo.area_by_iteration(details, 50, a)
+        by_sampling = monte_carlo.area_by_sampling(details, 50, a)
+        self.assertEqual(by_iteration.shape, (3, 51))
+        self.assertEqual(by_sampling.shape, (3, 400))
+
+        for row in range(3):
+            expected = [(np.sum(details[row] >= j) / 400) * a for j in range(51)]
+            self.assertTrue(np.array_equal(by_iteration[row], expected))
+            expected = [(np.sum(details[row][:t + 1] == 50) / t) * a for t in range(1, 401)]
+            self.assertTrue(np.array_equal(by_sampling[row], expected))
+
+
+if __name__ == '__main__':
+    unittest.main()
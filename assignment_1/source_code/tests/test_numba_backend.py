@@ -0,0 +1,64 @@
+import unittest
+import numpy as np
+from .. import mandelbrot
+from .. import sampling_method
+
+# Backend module used by mandelbrot and sampling_method (imported by them without the package prefix),
+# set_backend must be called on it for their dispatch to be tested.
+numba_backend = mandelbrot.numba_backend
+
+
+class NumbaBackendTestCase(unittest.TestCase):
+    """
+    Kernels of the numba backend are plain Python when numba is not installed, their results are checked either way.
+    """
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.c = mandelbrot.grid_map_batch(rng.uniform(0, 600, 300), rng.uniform(0, 400, 300))
+
+    def tearDown(self):
+        numba_backend.set_backend()
+
+    def test_escape_time(self):
+        counts, z = mandelbrot.mandelbrot_resume(self.c, np.zeros_like(self.c), 0, 150)
+        for parallel in (False, True):
+            numba_counts, numba_z = numba_backend.mandelbrot_resume(self.c, np.zeros_like(self.c), 0, 150, parallel)
+            self.assertTrue(np.array_equal(numba_counts, counts))
+            self.assertTrue(np.array_equal(numba_z, z))
+
+        # Resumed from the state after 150 iterations
+        numba_counts, _ = numba_backend.mandelbrot_resume(self.c[counts == 150], z[counts == 150], 150, 400)
+        self.assertTrue(np.array_equal(numba_counts, mandelbrot.mandelbrot_batch(self.c[counts == 150], 400)))
+        self.assertEqual([numba_backend.escape_time(c.real, c.imag, 0., 0., 0, 150)[0] for c in self.c], list(counts))
+
+    def test_orthogonal_points(self):
+        x, y = sampling_method.orthogonal_native(600, 400, 100, np.random.default_rng(3), major=4)
+        rng = np.random.default_rng(3)
+        cells = np.broadcast_to(np.arange(16).reshape(4, 4), (7, 4, 4))
+        xlist, ylist = rng.permuted(cells, axis=2), rng.permuted(cells, axis=2)
+        ux, uy = rng.random((7, 4, 4)), rng.random((7, 4, 4))
+        x_samples, y_samples = np.empty((7, 4, 4)), np.empty((7, 4, 4))
+        numba_backend.orthogonal_points(xlist, ylist, ux, uy, 600, 400, x_samples, y_samples)
+        self.assertTrue(np.array_equal(x_samples.ravel()[:100], x))
+        self.assertTrue(np.array_equal(y_samples.ravel()[:100], y))
+
+    def test_set_backend(self):
+        self.assertIs(sampling_method.numba_backend, numba_backend)
+        numba_backend.set_backend('numpy')
+        self.assertFalse(numba_backend.use_numba())
+        self.assertRaises(ValueError, numba_backend.set_backend, 'cuda')
+        if not numba_backend.NUMBA_AVAILABLE:
+            self.assertRaises(ImportError, numba_backend.set_backend, 'numba')
+            return
+
+        expected = mandelbrot.mandelbrot_batch(self.c, 200)
+        samples = sampling_method.orthogonal_native(600, 400, 100, np.random.default_rng(3))
+        numba_backend.set_backend('numba')
+        self.assertTrue(numba_backend.use_numba())
+        self.assertTrue(np.array_equal(mandelbrot.mandelbrot_batch(self.c, 200), expected))
+        self.assertTrue(np.array_equal(sampling_method.orthogonal_native(600, 400, 100, np.random.default_rng(3)),
+                                       samples))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import numpy as np
+from .. import sampling_method
+
+METHODS = [sampling_method.pure_random, sampling_method.halton_sequence, sampling_method.latin_square_chaos,
+           sampling_method.orthogonal_native, sampling_method.scrambled_halton, sampling_method.scrambled_sobol]
+
+
+class SamplingMethodTestCase(unittest.TestCase):
+    def test_rng_reproducible(self):
+        for method in METHODS:
+            x1, y1 = method(600, 400, 100, np.random.default_rng(3))
+            x2, y2 = method(600, 400, 100, np.random.default_rng(3))
+            x3, _ = method(600, 400, 100, np.random.default_rng(4))
+            self.assertTrue(np.array_equal(x1, x2) and np.array_equal(y1, y2))
+            self.assertFalse(np.array_equal(x1, x3))
+
+    def test_latin_square_chaos(self):
+        x, y = sampling_method.latin_square_chaos(1, 1, 50, np.random.default_rng(0))
+        self.assertTrue(np.array_equal(np.sort(np.floor(x * 50)), np.arange(50)))
+        self.assertTrue(np.array_equal(np.sort(np.floor(y * 50)), np.arange(50)))
+
+    def test_orthogonal_native(self):
+        major = 4
+        x, y = sampling_method.orthogonal_native(16, 16, 16, np.random.default_rng(0), major)
+        # One sample per minor row/column and per subsquare.
+        self.assertTrue(np.array_equal(np.sort(np.floor(x)), np.arange(16)))
+        self.assertTrue(np.array_equal(np.sort(np.floor(y)), np.arange(16)))
+        subsquares = np.floor(x / major) * major + np.floor(y / major)
+        self.assertTrue(np.array_equal(np.sort(subsquares), np.arange(16)))
+
+        x, y = sampling_method.orthogonal_native(600, 400, 1003, np.random.default_rng(0))
+        self.assertEqual((x.size, y.size), (1003, 1003))
+        self.assertTrue(0 <= x.min() and x.max() < 600 and 0 <= y.min() and y.max() < 400)
+
+    def test_halton(self):
+        samples = sampling_method.halton(3).round(4)
+        self.assertTrue(np.array_equal(samples, [[0.125, 0.625, 0.375], [0.4444, 0.7778, 0.2222]]))
+        self.assertTrue(np.array_equal(sampling_method.halton(5, skip=10), sampling_method.halton(20)[:, 6:11]))
+
+        samples = sampling_method.halton(9, skip=0, scramble=True, rng=np.random.default_rng(0))
+        self.assertTrue(np.array_equal(np.sort(np.floor(samples[1] * 9)), np.arange(9)))
+
+    def test_sobol(self):
+        for scramble in [False, True]:
+            samples = sampling_method.sobol(256, 2, scramble=scramble, rng=np.random.default_rng(1))
+            # Every elementary interval of size 1/16 x 1/16 holds exactly one point.
+            cells = np.floor(samples[0] * 16) * 16 + np.floor(samples[1] * 16)
+            self.assertTrue(np.array_equal(np.sort(cells), np.arange(256)))
+
+        self.assertTrue(np.array_equal(sampling_method.sobol(30, 3, skip=70), sampling_method.sobol(100, 3)[:, 70:]))
+
+    def test_orthogonal(self):
+        x, y = sampling_method.orthogonal(600, 400, 2500, np.random.default_rng(0))
+        self.assertTrue(np.array_equal(np.sort(np.floor(x / (600 / 2500))), np.arange(2500)))
+        self.assertTrue(np.array_equal(np.sort(np.floor(y / (400 / 2500))), np.arange(2500)))
+
+        # n = 1000 leaves 24 of the 32 x 32 subsquares empty, at most two per major row and column.
+        x, y = sampling_method.orthogonal(600, 400, 1000, np.random.default_rng(0))
+        self.assertEqual(x.size, 1000)
+        for v, size in ((x, 600), (y, 400)):
+            self.assertGreaterEqual(np.bincount(np.floor(v / (size / 32)).astype(int), minlength=32).min(), 30)
+            self.assertEqual(np.unique(np.floor(v / (size / 1024))).size, 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import tempfile
+import unittest
+import numpy as np
+from .. import statistical_analysis
+from ..checkpoint import Checkpoint
+from ..sampling_method import pure_random
+
+RE, IM = (-2.02, 0.49), (-1.15, 1.15)
+
+
+class StatisticalAnalysisTestCase(unittest.TestCase):
+    def test_parallel_reproducible(self):
+        args = (0.05, 5, 500, 100, RE, IM, 600, 400, pure_random)
+        serial = statistical_analysis.confidence_interval_estimate(*args, seed=7, processes=1, batch_size=4)
+        parallel = statistical_analysis.confidence_interval_estimate(*args, seed=7, processes=3, batch_size=4)
+        self.assertEqual(serial, parallel)
+        self.assertEqual(serial[-1] % 4, 0)
+
+        fixed = statistical_analysis.confidence_interval_estimate_fixed(6, 500, 100, RE, IM, 600, 400, seed=7)
+        fixed_parallel = statistical_analysis.confidence_interval_estimate_fixed(
+            6, 500, 100, RE, IM, 600, 400, seed=7, processes=2, batch_size=4)
+        self.assertEqual(fixed, fixed_parallel)
+
+    def test_sequential_estimate(self):
+        args = (0.04, 5, 500, 100, RE, IM, 600, 400, pure_random)
+        x_, s2_, min, max, it = statistical_analysis.sequential_estimate(*args, seed=3, check_every=4)
+        self.assertLess(max - min, 0.04)
+        self.assertGreater(it, 5)
+        self.assertEqual(statistical_analysis.sequential_estimate(*args, seed=3, check_every=4, processes=2),
+                         (x_, s2_, min, max, it))
+
+        x_, s2_, min, max, it = statistical_analysis.sequential_estimate(*args, seed=3, max_replicates=6)
+        self.assertEqual(it, 6)
+        self.assertGreater(max - min, 0.04)
+
+    def test_checkpoint_resume(self):
+        args = (0.5, 6, 500, 100, RE, IM, 600, 400)
+        interrupt = [4]
+
+        def sampler(w, h, n, rng=None):
+            interrupt[0] -= 1
+            if interrupt[0] == 0:
+                raise KeyboardInterrupt
+            return pure_random(w, h, n, rng)
+
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = Checkpoint(directory, test='interval')
+            with self.assertRaises(KeyboardInterrupt):
+                statistical_analysis.confidence_interval_estimate(*args, sampler, rng=np.random.default_rng(5),
+                                                                  checkpoint=checkpoint, stage='stop')
+
+            # The rerun resumes from the fourth simulation with the saved statistics and RNG state.
+            resumed = statistical_analysis.confidence_interval_estimate(*args, sampler, rng=np.random.default_rng(),
+                                                                        checkpoint=checkpoint, stage='stop')
+            expected = statistical_analysis.confidence_interval_estimate(*args, sampler, rng=np.random.default_rng(5))
+            self.assertEqual(resumed, expected)
+            self.assertEqual(resumed, statistical_analysis.confidence_interval_estimate(
+                *args, sampler, checkpoint=checkpoint, stage='stop'))
+
+            # Batches of the fixed estimate are saved with the root seed of their simulations.
+            interrupt[0] = 7
+            fixed = (9, 500, 100, RE, IM, 600, 400, sampler)
+            with self.assertRaises(KeyboardInterrupt):
+                statistical_analysis.confidence_interval_estimate_fixed(*fixed, seed=7, batch_size=4,
+                                                                        checkpoint=checkpoint, stage='fixed')
+            resumed = statistical_analysis.confidence_interval_estimate_fixed(*fixed, seed=7, batch_size=4,
+                                                                              checkpoint=checkpoint, stage='fixed')
+            self.assertEqual(resumed, statistical_analysis.confidence_interval_estimate_fixed(*fixed, seed=7,
+                                                                                              batch_size=4))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -21,6 +21,44 @@ class MyTestCase(unittest.TestCase):
         x = np.array([170, 300, 430, 470, 600])
         self.assertEqual(statistical_analysis_utils.sample_standard_deviation(x), np.sqrt(27130))
 
+    def test_max_relative_difference(self):
+        x = np.random.default_rng(0).uniform(1, 2, (4, 30, 7))
+        x[0, :, 0] = 0
+        x[1, :5, 1] = 0
+        result = statistical_analysis_utils.max_relative_difference(x, axis=1)
+        self.assertEqual(result.shape, (4, 7))
+        for m in range(4):
+            for j in range(7):
+                expected = 0
+                for t in range(30):
+                    for u in range(t + 1, 30):
+                        if x[m, t, j] + x[m, u, j] > 0:
+                            expected = max(expected, abs(x[m, t, j] - x[m, u, j]) / abs(x[m, t, j] + x[m, u, j]))
+                self.assertAlmostEqual(result[m, j], expected, places=12)
+
+    def test_online_statistics(self):
+        x = np.random.default_rng(0).normal(1e6, 3., 1000)
+        statistics = statistical_analysis_utils.OnlineStatistics()
+        for value in x[:10]:
+            statistics.update(value)
+        statistics.update(x[10:500])
+        statistics.merge(statistical_analysis_utils.OnlineStatistics(x[500:700]))
+        statistics.merge(statistical_analysis_utils.OnlineStatistics(x[700:]).merge(statistical_analysis_utils.OnlineStatistics()))
+        self.assertEqual(statistics.n, 1000)
+        self.assertAlmostEqual(statistics.mean, statistical_analysis_utils.sample_mean(x), places=6)
+        self.assertAlmostEqual(statistics.variance, statistical_analysis_utils.sample_variance(x), places=6)
+        self.assertEqual(statistics.confidence_interval(0.05), statistical_analysis_utils.confidence_interval_ppf(
+            statistics.mean, statistics.standard_deviation, 0.05, 1000))
+
+        self.assertEqual(statistical_analysis_utils.OnlineStatistics([2.]).variance, 0.)
+        self.assertEqual(statistical_analysis_utils.OnlineStatistics(np.arange(1, 6, 1)).variance, 2.5)
+
+    def test_replicates_needed(self):
+        self.assertAlmostEqual(statistical_analysis_utils.normal_quantile(0.05), 1.959964, places=6)
+        n = statistical_analysis_utils.replicates_needed(0.1, 0.01, 0.05)
+        self.assertLess(statistical_analysis_utils.confidence_interval_ppf(0, 0.1, 0.05, n)[2], 0.01)
+        self.assertGreaterEqual(statistical_analysis_utils.confidence_interval_ppf(0, 0.1, 0.05, n - 1)[2], 0.01)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,74 @@
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+
+MAX_BYTES = 64 * 2**20  # Memory budget of the tiles kept in memory
+
+
+class TileCache:
+    """
+    Least recently used cache of tiles of iteration counts, keyed by (zoom level, tile index, max_iter, tile size).
+    Tiles are evicted from memory once their total size exceeds max_bytes; when a directory is given,
+    evicted tiles are spilled to disk as .npy files and loaded back on the next access.
+    The cache may be shared by several render threads.
+    """
+    def __init__(self, max_bytes=MAX_BYTES, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.tiles = OrderedDict()
+        self.nbytes = 0
+        self.hits = self.misses = 0
+        self.lock = threading.RLock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        """
+        Path of the file of a spilled tile.
+        :param key: tuple (level, (tx, ty), max_iter, tile_size)
+        """
+        level, (tx, ty), max_iter, tile_size = key
+        return os.path.join(self.directory, '{0}_{1}_{2}_{3}_{4}.npy'.format(level, tx, ty, max_iter, tile_size))
+
+    def __contains__(self, key):
+        return key in self.tiles or (self.directory is not None and os.path.exists(self.path(key)))
+
+    def get(self, key):
+        """
+        Tile of iteration counts, marked as the most recently used.
+        :param key: tuple (level, (tx, ty), max_iter, tile_size)
+        :return: integer array, None if the tile is not cached
+        """
+        with self.lock:
+            if key in self.tiles:
+                self.tiles.move_to_end(key)
+                self.hits += 1
+                return self.tiles[key]
+
+            if self.directory is not None and os.path.exists(self.path(key)):
+                self.hits += 1
+                tile = np.load(self.path(key))
+                self.put(key, tile)
+                return tile
+
+            self.misses += 1
+            return None
+
+    def put(self, key, tile):
+        """
+        Store a tile, and evict the least recently used ones beyond the memory budget.
+        :param key: tuple (level, (tx, ty), max_iter, tile_size)
+        :param tile: integer array of iteration counts
+        """
+        with self.lock:
+            if key in self.tiles:
+                self.nbytes -= self.tiles.pop(key).nbytes
+            self.tiles[key] = tile
+            self.nbytes += tile.nbytes
+
+            while self.nbytes > self.max_bytes and len(self.tiles) > 1:
+                old_key, old_tile = self.tiles.popitem(last=False)
+                self.nbytes -= old_tile.nbytes
+                if self.directory is not None and not os.path.exists(self.path(old_key)):
+                    np.save(self.path(old_key), old_tile)